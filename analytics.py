@@ -0,0 +1,193 @@
+"""Multi-week attendance analytics over the whole history.
+
+Everything is computed on one school × grade × week matrix: rows are the
+(level, school, grade) series, columns the attendance weeks in time order. The
+rolling, cumulative and term metrics are then array operations over all
+series at once; nothing loops per school or per week.
+
+Windows never cross a term boundary: the weeks between terms are holidays,
+so a 4-week window at the start of a term only looks back to week one.
+
+``attendance_alerts`` runs the same way over the boys', girls' and overall
+series to flag sudden drops against each series' own recent history.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import week_number
+
+SERIES_KEYS = ["Education_Level", "School_Name", "Grade_Level"]
+ROLLING_WEEKS = 4
+GENDERS = ["Boys", "Girls", "Total"]
+# Anomaly detection: trailing baseline length, minimum history, robust z and drop thresholds
+BASELINE_WEEKS = 8
+MIN_BASELINE_WEEKS = 4
+ALERT_Z = -3.5
+ALERT_MIN_DROP = 10.0
+# Rates of very small classes swing too much to alert on
+ALERT_MIN_ENROLMENT = 10
+ALERT_CHUNK = 4096
+ALERT_COLS = SERIES_KEYS + ["Gender", "Year", "Term", "Attendance_Week",
+                            "Rate (%)", "Baseline (%)", "Drop (pts)", "Score"]
+
+
+def _week_matrices(dataset, columns):
+    """(series index, week columns, {column: series × week matrix}); missing weeks are 0."""
+    totals = dataset.attendance.frame.groupby(
+        level=SERIES_KEYS + ["Year", "Term", "Attendance_Week"]
+    )[columns].sum()
+    weeks = totals.index.droplevel(SERIES_KEYS).unique().to_frame(index=False)
+    weeks["Week"] = weeks["Attendance_Week"].map(week_number)
+    weeks = weeks.sort_values(["Year", "Term", "Week"], ignore_index=True)
+    week_index = pd.MultiIndex.from_frame(weeks[["Year", "Term", "Attendance_Week"]])
+
+    wide = totals.unstack(["Year", "Term", "Attendance_Week"], fill_value=0)
+    matrices = {col: wide[col].reindex(columns=week_index, fill_value=0).to_numpy(dtype=float) for col in columns}
+    return wide.index, weeks, matrices
+
+
+def attendance_matrix(dataset):
+    """(series index, week columns, attendance matrix, enrolment matrix); missing weeks are 0."""
+    series, weeks, matrices = _week_matrices(dataset, ["Total_Attendance", "Total_Enrolment"])
+    return series, weeks, matrices["Total_Attendance"], matrices["Total_Enrolment"]
+
+
+def _rate(attendance, enrolment):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(enrolment > 0, attendance / enrolment * 100, np.nan)
+
+
+def weekly_metrics(series, weeks, attendance, enrolment, window=ROLLING_WEEKS):
+    """Per series and week: rate, rolling ``window``-week rate and cumulative term attendance.
+
+    Both windows come from one cumulative sum along the week axis: a window
+    is the difference of two of its columns, with the start clipped to the
+    first week of the term.
+    """
+    n_weeks = len(weeks)
+    position = np.arange(n_weeks)
+    term_id = weeks.groupby(["Year", "Term"], sort=False).ngroup().to_numpy()
+    term_start = pd.Series(position).groupby(term_id).transform("min").to_numpy()
+    window_start = np.maximum(position + 1 - window, term_start)
+
+    def windowed(values, starts):
+        cumulative = np.concatenate([np.zeros((len(values), 1)), values.cumsum(axis=1)], axis=1)
+        return cumulative[:, position + 1] - cumulative[:, starts]
+
+    rolling_rate = _rate(windowed(attendance, window_start), windowed(enrolment, window_start))
+    cumulative_attendance = windowed(attendance, term_start)
+
+    # One row per (series, week), series-major like the matrix
+    frame = series.to_frame(index=False).loc[np.repeat(np.arange(len(series)), n_weeks)].reset_index(drop=True)
+    week_cols = weeks.loc[np.tile(position, len(series)), ["Year", "Term", "Attendance_Week"]].reset_index(drop=True)
+    frame = pd.concat([frame, week_cols], axis=1)
+    frame["Attendance"] = attendance.ravel()
+    frame["Enrolment"] = enrolment.ravel()
+    frame["Rate (%)"] = _rate(attendance, enrolment).ravel()
+    frame[f"Rolling {window}-Week Rate (%)"] = rolling_rate.ravel()
+    frame["Cumulative Term Attendance"] = cumulative_attendance.ravel()
+    # Weeks with no enrolment are weeks the grade did not report
+    return frame[frame["Enrolment"] > 0].reset_index(drop=True)
+
+
+def term_metrics(series, weeks, attendance, enrolment):
+    """Per series and term: term rate, change on the previous term and on the same term a year earlier."""
+    terms = weeks[["Year", "Term"]].drop_duplicates(ignore_index=True)
+    term_id = weeks.groupby(["Year", "Term"], sort=False).ngroup().to_numpy()
+    # Sum the week columns of each term in one matrix product
+    membership = np.zeros((len(weeks), len(terms)))
+    membership[np.arange(len(weeks)), term_id] = 1
+    term_attendance = attendance @ membership
+    term_enrolment = enrolment @ membership
+    rate = _rate(term_attendance, term_enrolment)
+
+    previous = np.full_like(rate, np.nan)
+    previous[:, 1:] = rate[:, :-1]
+
+    lookup = {(year, term): i for i, (year, term) in enumerate(terms.itertuples(index=False))}
+    last_year = np.array([lookup.get((year - 1, term), -1) for year, term in terms.itertuples(index=False)])
+    year_ago = np.where(last_year >= 0, rate[:, last_year], np.nan)
+
+    frame = series.to_frame(index=False).loc[np.repeat(np.arange(len(series)), len(terms))].reset_index(drop=True)
+    frame = pd.concat([frame, terms.loc[np.tile(np.arange(len(terms)), len(series))].reset_index(drop=True)], axis=1)
+    frame["Attendance"] = term_attendance.ravel()
+    frame["Term Rate (%)"] = rate.ravel()
+    frame["Term-over-Term Δ (pts)"] = (rate - previous).ravel()
+    frame["Year-over-Year Δ (pts)"] = (rate - year_ago).ravel()
+    return frame[term_enrolment.ravel() > 0].reset_index(drop=True)
+
+
+def attendance_analytics(dataset):
+    """(weekly metrics, term metrics) for every school and grade in the dataset."""
+    series, weeks, attendance, enrolment = attendance_matrix(dataset)
+    return (
+        weekly_metrics(series, weeks, attendance, enrolment),
+        term_metrics(series, weeks, attendance, enrolment),
+    )
+
+
+# ---- Anomalies ----
+def _trailing_median_mad(rates, weeks, min_weeks):
+    """Median and MAD of each cell's previous ``weeks`` rates (NaN weeks ignored), for every series at once."""
+    padded = np.concatenate([np.full((len(rates), weeks), np.nan), rates], axis=1)
+    # windows[:, j] holds the ``weeks`` rates before week j
+    windows = np.lib.stride_tricks.sliding_window_view(padded, weeks, axis=1)[:, :-1]
+    enough = (~np.isnan(windows)).sum(axis=2) >= min_weeks
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows give NaN, masked below
+        median = np.nanmedian(windows, axis=2)
+        mad = np.nanmedian(np.abs(windows - median[:, :, None]), axis=2)
+    median[~enough] = np.nan
+    return median, mad
+
+
+def attendance_alerts(dataset, baseline_weeks=BASELINE_WEEKS, min_weeks=MIN_BASELINE_WEEKS,
+                      z_threshold=ALERT_Z, min_drop=ALERT_MIN_DROP):
+    """Sudden attendance drops in every school × grade × gender series over the whole history.
+
+    Each week's rate is scored against the median and MAD of the same series'
+    previous ``baseline_weeks`` weeks (a robust z-score: one bad week does
+    not hide the next). A cell is flagged when its score is at or below
+    ``z_threshold`` and the rate fell at least ``min_drop`` points below the
+    baseline, so series with a flat history do not flag on tiny dips.
+    Series are processed in chunks to bound memory.
+    """
+    if not len(dataset.attendance):
+        return pd.DataFrame(columns=ALERT_COLS)
+    columns = [f"{gender}_{kind}" for gender in GENDERS for kind in ("Attendance", "Enrolment")]
+    series, weeks, matrices = _week_matrices(dataset, columns)
+    rates = np.concatenate([
+        _rate(matrices[f"{gender}_Attendance"], matrices[f"{gender}_Enrolment"]) for gender in GENDERS
+    ])
+    enrolment = np.concatenate([matrices[f"{gender}_Enrolment"] for gender in GENDERS])
+    rates[enrolment < ALERT_MIN_ENROLMENT] = np.nan
+
+    flagged = []
+    for start in range(0, len(rates), ALERT_CHUNK):
+        chunk = rates[start:start + ALERT_CHUNK]
+        median, mad = _trailing_median_mad(chunk, baseline_weeks, min_weeks)
+        drop = median - chunk
+        # 1.4826 × MAD estimates the standard deviation; floor it so a flat history still scores
+        scale = np.maximum(1.4826 * mad, 1.0)
+        score = -drop / scale
+        rows, cols = np.nonzero((score <= z_threshold) & (drop >= min_drop))
+        flagged.append((rows + start, cols, chunk[rows, cols], median[rows, cols], drop[rows, cols], score[rows, cols]))
+
+    if not flagged:
+        return pd.DataFrame(columns=ALERT_COLS)
+    rows, cols, rate, baseline, drop, score = (np.concatenate(parts) for parts in zip(*flagged))
+    n_series = len(series)
+    keys = series.to_frame(index=False)
+    alerts = pd.concat([
+        keys.iloc[rows % n_series].reset_index(drop=True),
+        pd.DataFrame({"Gender": np.array(GENDERS)[rows // n_series]}),
+        weeks.loc[cols, ["Year", "Term", "Attendance_Week"]].reset_index(drop=True),
+    ], axis=1)
+    alerts["Gender"] = alerts["Gender"].replace({"Total": "All"})
+    alerts["Rate (%)"] = rate
+    alerts["Baseline (%)"] = baseline
+    alerts["Drop (pts)"] = drop
+    alerts["Score"] = score
+    return alerts.sort_values(["Drop (pts)"], ascending=False, ignore_index=True)[ALERT_COLS]
@@ -0,0 +1,229 @@
+"""Local JSON API over the dashboard aggregates.
+
+Serves the same numbers as attendance_2.py without Streamlit:
+
+    python api_server.py --port 8502
+
+Endpoints (all GET, parameters in the query string):
+
+    /version                                   current data version
+    /enrolment?year=&term=&level=[&grade=]     enrolment summary table
+    /attendance?year=&term=&week=&level=       attendance summary table
+    /gender?year=&term=&week=&level=           boys/girls/average rates per school
+    /trends?year=&term=&level=[&weeks=Week 12,Week 13]
+                                               weekly trend rates per school and grade
+
+Every response carries an ETag built from the data version and the request, so
+a client that sends it back in ``If-None-Match`` gets a 304 without anything
+being recomputed.
+"""
+import argparse
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from data_pipeline import (
+    ALL_LEVELS, DATA_PATH, load_dataset, summarize_enrolment, summarize_attendance,
+    gender_rates, default_trend_weeks, weekly_trends,
+)
+
+
+class BadRequest(Exception):
+    pass
+
+
+# ---- Query Parsing ----
+def _param(query, name, required=True):
+    values = query.get(name)
+    if not values or values[0] == "":
+        if required:
+            raise BadRequest(f"missing query parameter '{name}'")
+        return None
+    return values[0]
+
+
+def _choice(query, name, options, required=True):
+    """Match a query value against the typed values in the data (e.g. Term is an int)."""
+    value = _param(query, name, required)
+    if value is None:
+        return None
+    for option in options:
+        if str(option) == value:
+            return option
+    raise BadRequest(f"unknown {name} '{value}'")
+
+
+def _level(query, dataset):
+    return _choice(query, "level", [ALL_LEVELS] + list(dataset.school_order))
+
+
+# ---- Endpoints ----
+def enrolment(dataset, query):
+    options = dataset.options
+    year = _choice(query, "year", options.enrol_years)
+    term = _choice(query, "term", options.enrol_terms_by_year.get(year, []))
+    level = _level(query, dataset)
+    grade = None
+    if level != ALL_LEVELS:
+        grade = _choice(query, "grade", options.grades_by_term.get((year, term, level), []), required=False)
+    return summarize_enrolment(dataset.enrolment_rows(year, term, level, grade), level, dataset.school_order)
+
+
+def _year_term(dataset, query):
+    options = dataset.options
+    year = _choice(query, "year", options.years)
+    return year, _choice(query, "term", options.terms_by_year.get(year, []))
+
+
+def _week_rows(dataset, query):
+    year, term = _year_term(dataset, query)
+    week = _choice(query, "week", dataset.weeks(year, term))
+    return dataset.week_rows(year, term, week)
+
+
+def attendance(dataset, query):
+    level = _level(query, dataset)
+    return summarize_attendance(_week_rows(dataset, query), level, dataset.school_order)
+
+
+def gender(dataset, query):
+    level = _level(query, dataset)
+    combined = gender_rates(_week_rows(dataset, query), dataset.school_order)
+    if level != ALL_LEVELS:
+        combined = combined[combined["Education_Level"] == level].reset_index(drop=True)
+    return combined
+
+
+def trends(dataset, query):
+    year, term = _year_term(dataset, query)
+    level = _choice(query, "level", list(dataset.school_order))
+    weeks = _param(query, "weeks", required=False)
+    if weeks is None:
+        weeks = default_trend_weeks(dataset.weeks(year, term))
+    else:
+        known = set(dataset.weeks(year, term))
+        weeks = [w.strip() for w in weeks.split(",")]
+        unknown = [w for w in weeks if w not in known]
+        if unknown:
+            raise BadRequest(f"unknown weeks {unknown}")
+    trend_df = weekly_trends(dataset.term_rows(year, term), level, weeks)
+    if not trend_df.empty:
+        trend_df = trend_df.assign(Attendance_Week=trend_df["Attendance_Week"].astype(str))
+    return trend_df
+
+
+ENDPOINTS = {
+    "/enrolment": enrolment,
+    "/attendance": attendance,
+    "/gender": gender,
+    "/trends": trends,
+}
+
+
+# ---- HTTP ----
+class AggregateCache:
+    """Serialized responses keyed by (data version, path, query); entries for older versions are dropped."""
+
+    def __init__(self):
+        self.version = None
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def get(self, version, key):
+        with self.lock:
+            if version != self.version:
+                return None
+            return self.responses.get(key)
+
+    def put(self, version, key, body):
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.responses = {}
+            self.responses[key] = body
+
+
+def make_etag(version, key):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+    return f'"{version}-{digest}"'
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    data_path = DATA_PATH
+    cache = AggregateCache()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        key = (url.path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+
+        if url.path != "/version" and url.path not in ENDPOINTS:
+            return self._send_json(404, {"error": f"unknown endpoint '{url.path}'"})
+
+        # The ETag, cache key and body all come from this one load: a workbook replaced between a
+        # separate version check and the load would otherwise cache new data under the old ETag
+        try:
+            dataset = load_dataset(self.data_path)
+        except FileNotFoundError:
+            return self._send_json(503, {"error": f"data file not found: {self.data_path}"})
+        version = dataset.version
+
+        etag = make_etag(version, key)
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = self.cache.get(version, key)
+        if body is None:
+            if url.path == "/version":
+                payload = {"version": version}
+            else:
+                try:
+                    table = ENDPOINTS[url.path](dataset, query)
+                except BadRequest as exc:
+                    return self._send_json(400, {"error": str(exc)})
+                payload = {"version": version, "rows": json.loads(table.to_json(orient="records"))}
+            body = json.dumps(payload).encode("utf-8")
+            self.cache.put(version, key, body)
+
+        self._send_body(200, body, etag)
+
+    def _send_json(self, status, payload):
+        self._send_body(status, json.dumps(payload).encode("utf-8"))
+
+    def _send_body(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve FCA dashboard aggregates as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="enrolment/attendance workbook")
+    args = parser.parse_args()
+
+    ApiHandler.data_path = args.data
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    print(f"Serving FCA aggregates on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
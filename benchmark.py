@@ -0,0 +1,348 @@
+"""Benchmarks for the dashboard pipeline on a large synthetic dataset.
+
+    python benchmark.py --schools 200 --years 3 memory
+    python benchmark.py warmup
+    python benchmark.py levels --workers 4
+    python benchmark.py --schools 50 payload --trend-weeks 4
+    python benchmark.py --years 5 projections
+    python benchmark.py --schools 1000 cohorts
+    python benchmark.py --schools 20 registers --learners 40
+    python benchmark.py --schools 1000 schools
+
+``memory`` runs the data preparation of one full dashboard rerun (enrolment
+table, attendance table, per-level frames and gender rates, weekly trends and
+the trend line) under the same ``MemoryProfile`` the app uses and prints the
+per-stage allocations and the rerun peak. ``warmup`` times the default views
+on a cold cache, after ``view_cache.warm`` has run, and on a repeat click.
+``levels`` times the trend tables for every level from one groupby against
+one per level, then the per-level charts and trend grids built one level after
+another (with the subplot grids built afresh and cached) and in a thread pool. ``payload`` prints the serialized size of every
+per-level chart in the standard and the compact rendering, and of the
+enrolment table whole and one page at a time. ``projections``
+times the batched next-term fit over every school × grade series, and
+``cohorts`` the grade-to-grade cohort matching over the whole history.
+``registers`` writes a learner-level daily register CSV and times its chunked
+ingestion, with the peak Python/NumPy allocation. ``schools`` times building
+the per-school partitions and opening one school from them, against filtering
+the whole attendance table for it.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import (
+    ALL_LEVELS, Dataset, SchoolPartitions, summarize_enrolment, summarize_attendance, level_frame, gender_rates,
+    default_trend_weeks, weekly_trends, weekly_trends_by_level, weekly_attendance,
+)
+from memory_profile import MemoryProfile
+from views import payload_report, table_page, enrolment_table_html
+from projections import project_next_term
+from cohorts import cohort_progression
+from registers import REGISTER_COLS, read_registers
+import view_cache
+import views
+
+GRADES = {
+    "ECDE": ["PP1", "PP2"],
+    "Primary": [f"Grade {n}" for n in range(1, 7)],
+    "Junior": [f"Grade {n}" for n in range(7, 10)],
+    "Secondary": [f"Form {n}" for n in range(1, 5)],
+}
+
+
+# ---- Synthetic Data ----
+def synthetic_dataset(schools=200, years=3, terms=3, weeks=13, seed=0):
+    """A Dataset shaped like the real workbook, scaled up.
+
+    ``schools`` basic schools each run ECDE, Primary and Junior (as in the real
+    data) and ``schools`` more run Secondary. Enrolment is random per
+    school/grade/term and attendance is a noisy fraction of it each week.
+    """
+    rng = np.random.default_rng(seed)
+    basic = [f"Basic School {i:04d}" for i in range(schools)]
+    secondary = [f"Secondary School {i:04d}" for i in range(schools)]
+    school_order = {level: (secondary if level == "Secondary" else basic) for level in GRADES}
+
+    frames = []
+    for level, grades in GRADES.items():
+        index = pd.MultiIndex.from_product(
+            [range(2025 - years + 1, 2026), range(1, terms + 1), school_order[level], grades],
+            names=["Year", "Term", "School_Name", "Grade_Level"],
+        )
+        frames.append(index.to_frame(index=False).assign(Education_Level=level))
+    enrol_df = pd.concat(frames, ignore_index=True)
+    enrol_df["Boys"] = rng.integers(0, 400, len(enrol_df)).astype(float)
+    enrol_df["Girls"] = rng.integers(0, 400, len(enrol_df)).astype(float)
+    enrol_df["Total"] = enrol_df["Boys"] + enrol_df["Girls"]
+
+    attend_df = enrol_df.loc[enrol_df.index.repeat(weeks)].reset_index(drop=True)
+    attend_df["Attendance_Week"] = [f"Week {n}" for n in range(1, weeks + 1)] * len(enrol_df)
+    for col in ["Boys", "Girls"]:
+        attend_df[col] = (attend_df[col] * rng.uniform(0.4, 1.0, len(attend_df))).round()
+    attend_df["Total"] = attend_df["Boys"] + attend_df["Girls"]
+
+    version = f"synthetic-{schools}-{years}-{terms}-{weeks}-{seed}"
+    return Dataset(version, enrol_df, attend_df, school_order=school_order)
+
+
+# ---- Memory ----
+def profile_rerun(dataset, level=ALL_LEVELS):
+    """Run one rerun's data preparation for the latest year/term/week under MemoryProfile."""
+    school_order = dataset.school_order
+    year = dataset.options.years[-1]
+    term = dataset.options.terms_by_year[year][-1]
+    weeks = dataset.weeks(year, term)
+
+    memory = MemoryProfile(enabled=True)
+    memory.start()
+
+    summarize_enrolment(dataset.enrolment_rows(year, term, level), level, school_order)
+    memory.checkpoint("Enrolment summary")
+
+    filtered_df = dataset.week_rows(year, term, weeks[0])
+    term_df = dataset.term_rows(year, term)
+    memory.checkpoint("Attendance filters")
+
+    summarize_attendance(filtered_df, level, school_order)
+    memory.checkpoint("Attendance summary")
+
+    gender_rates(filtered_df, school_order)
+    for name in school_order:
+        level_frame(filtered_df, name, school_order)
+    memory.checkpoint("Per-level frames")
+
+    trend_weeks = default_trend_weeks(weeks)
+    for name in school_order:
+        weekly_trends(term_df, name, trend_weeks)
+    memory.checkpoint("Weekly trends")
+
+    weekly_attendance(term_df, level)
+    memory.checkpoint("Trend line")
+    return memory.report()
+
+
+def run_memory(args):
+    start = time.perf_counter()
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    merged_mb = dataset.attendance.frame.memory_usage(deep=True).sum() / 1e6
+    print(f"Synthetic data: {len(dataset.enrolment):,} enrolment rows, {len(dataset.attendance):,} merged rows "
+          f"({merged_mb:,.1f} MB) built in {time.perf_counter() - start:.1f}s")
+    report = profile_rerun(dataset)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+
+# ---- Warm-up ----
+def default_click(dataset):
+    """The view builds behind the dashboard's default selection, as one rerun makes them."""
+    year, term, week = view_cache.default_selection(dataset)
+    trend_weeks = view_cache.term_trend_weeks(dataset, year, term)
+    view_cache.enrolment_view(dataset, year, term, ALL_LEVELS)
+    view_cache.attendance_view(dataset, year, term, week, ALL_LEVELS)
+    view_cache.level_charts(dataset, year, term, week)
+    view_cache.trend_charts(dataset, year, term, trend_weeks)
+    view_cache.trend_line_chart(dataset, year, term, ALL_LEVELS)
+
+
+def _timed_ms(action):
+    start = time.perf_counter()
+    action()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_warmup(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    usage = view_cache.UsageStats(path="/dev/null")
+
+    view_cache.VIEWS = view_cache.ViewCache()
+    cold = _timed_ms(lambda: default_click(dataset))
+
+    view_cache.VIEWS = view_cache.ViewCache()
+    warm = _timed_ms(lambda: view_cache.warm(dataset, usage=usage))
+    first = _timed_ms(lambda: default_click(dataset))
+    repeat = _timed_ms(lambda: default_click(dataset))
+
+    print(f"First click, cold cache:   {cold:9.1f} ms")
+    print(f"Warm-up job (background):  {warm:9.1f} ms")
+    print(f"First click after warm-up: {first:9.1f} ms")
+    print(f"Repeat click:              {repeat:9.1f} ms")
+
+
+# ---- Per-Level Parallelism ----
+def run_levels(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    year, term, week = view_cache.default_selection(dataset)
+    trend_weeks = view_cache.term_trend_weeks(dataset, year, term)
+
+    def build_all(pool):
+        view_cache._level_charts(dataset, year, term, week, pool=pool)
+        view_cache._trends(dataset, year, term, trend_weeks, pool=pool)
+
+    def build_cold_grids():
+        views._subplot_grid.cache_clear()
+        build_all(False)
+
+    build_all(False)  # first call pays one-off Plotly imports and validator setup
+    term_df = dataset.term_rows(year, term)
+    per_level = min(_timed_ms(lambda: [weekly_trends(term_df, level, list(trend_weeks))
+                                       for level in dataset.school_order]) for _ in range(args.repeat))
+    one_pass = min(_timed_ms(lambda: weekly_trends_by_level(term_df, list(trend_weeks))) for _ in range(args.repeat))
+    cold = min(_timed_ms(build_cold_grids) for _ in range(args.repeat))
+    serial = min(_timed_ms(lambda: build_all(False)) for _ in range(args.repeat))
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        parallel = min(_timed_ms(lambda: build_all(pool)) for _ in range(args.repeat))
+
+    print(f"{len(dataset.school_order)} levels on {os.cpu_count()} CPUs, best of {args.repeat}")
+    for label, ms in [
+        ("Trend tables, one groupby per level", per_level),
+        ("Trend tables, one groupby in all", one_pass),
+        ("Serial, subplot grids built", cold),
+        ("Serial, subplot grids cached", serial),
+        (f"Thread pool ({args.workers}), grids cached", parallel),
+    ]:
+        print(f"{label + ':':<38}{ms:9.1f} ms")
+    print(f"{'Thread pool speedup:':<38}{serial / parallel:9.2f}x")
+
+
+# ---- Chart Payloads ----
+def run_payload(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    year, term, week = view_cache.default_selection(dataset)
+    trend_weeks = dataset.weeks(year, term)[:args.trend_weeks]
+
+    reports = []
+    for compact in (False, True):
+        charts = []
+        for level, rate_fig, gender_fig in view_cache._level_charts(dataset, year, term, week, compact, pool=False):
+            charts += [(f"{level} rate per grade", rate_fig), (f"{level} rate by gender", gender_fig)]
+        for level, trend_fig in view_cache._trends(dataset, year, term, trend_weeks, compact, pool=False):
+            if trend_fig is not None:
+                charts.append((f"{level} weekly trends", trend_fig))
+        reports.append(payload_report(charts).set_index("Chart"))
+
+    report = reports[0].join(reports[1], lsuffix=" standard", rsuffix=" compact")
+    report["Saved"] = 1 - report["Size (KB) compact"] / report["Size (KB) standard"]
+    print(f"{args.schools} schools per level, {len(trend_weeks)} trend weeks")
+    print(report.to_string(float_format=lambda v: f"{v:,.2f}"))
+    total_standard, total_compact = report["Size (KB) standard"].sum(), report["Size (KB) compact"].sum()
+    print(f"Total: {total_standard:,.0f} KB -> {total_compact:,.0f} KB")
+
+    summary = view_cache.enrolment_view(dataset, year, term, ALL_LEVELS)[0]
+    full_kb = len(enrolment_table_html(summary)) / 1024
+    page_kb = len(enrolment_table_html(table_page(summary)[0])) / 1024
+    print(f"Enrolment table, {len(summary) - 1:,} schools: {full_kb:,.1f} KB whole, {page_kb:,.1f} KB per page")
+
+
+# ---- Projections ----
+def run_projections(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    project_next_term(dataset)  # warm-up
+    elapsed = min(_timed_ms(lambda: project_next_term(dataset)) for _ in range(3))
+    projection = project_next_term(dataset)
+    print(f"Projected {len(projection):,} school × grade series from {args.years * args.terms} terms "
+          f"in {elapsed:,.1f} ms (best of 3)")
+
+
+def run_cohorts(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    elapsed = min(_timed_ms(lambda: cohort_progression(dataset)) for _ in range(3))
+    cohorts = cohort_progression(dataset)
+    print(f"Matched {len(cohorts):,} school × grade cohorts over {args.years} years "
+          f"in {elapsed:,.1f} ms (best of 3)")
+
+
+# ---- Learner Registers ----
+def write_register(path, schools=20, learners=40, years=1, terms=3, weeks=13, seed=0):
+    """A daily register CSV for ``learners`` learners per school/grade/gender; returns the row count.
+
+    Written one school day at a time, so the benchmark itself stays small.
+    """
+    rng = np.random.default_rng(seed)
+    roll = []
+    for level, grades in GRADES.items():
+        names = [f"{'Secondary' if level == 'Secondary' else 'Basic'} School {i:04d}" for i in range(schools)]
+        for school in names:
+            for grade in grades:
+                for gender in ["M", "F"]:
+                    roll += [(f"{school}/{grade}/{gender}{n:03d}", school, level, grade, gender) for n in range(learners)]
+    roll = pd.DataFrame(roll, columns=["Learner_ID", "School_Name", "Education_Level", "Grade_Level", "Gender"])
+
+    rows = 0
+    with open(path, "w") as out:
+        out.write(",".join(REGISTER_COLS) + "\n")
+        for year in range(2025 - years + 1, 2026):
+            for term in range(1, terms + 1):
+                start = pd.Timestamp(year, 4 * term - 3, 6)
+                for day in pd.bdate_range(start, periods=weeks * 5):
+                    register = roll.assign(Date=day.date().isoformat(), Year=year, Term=term,
+                                           Present=(rng.random(len(roll)) < 0.85).astype(int))
+                    register[REGISTER_COLS].to_csv(out, header=False, index=False)
+                    rows += len(register)
+    return rows
+
+
+def run_registers(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "register.csv")
+        start = time.perf_counter()
+        rows = write_register(path, args.schools, args.learners, args.years, args.terms, args.weeks)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Register: {rows:,} learner-days ({size_mb:,.1f} MB) written in {time.perf_counter() - start:.1f}s")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        enrol_df, attend_df = read_registers(path, chunk_rows=args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    print(f"Ingested in {elapsed:,.1f}s with {args.chunk_rows:,}-row chunks, peak allocation {peak:,.1f} MB")
+    print(f"-> {len(enrol_df):,} enrolment rows, {len(attend_df):,} weekly attendance rows")
+
+
+# ---- School Partitions ----
+def run_schools(args):
+    dataset = synthetic_dataset(args.schools, args.years, args.terms, args.weeks)
+    build = _timed_ms(lambda: SchoolPartitions(dataset.enrolment, dataset.attendance))
+    school = dataset.schools.names(dataset.school_order)[0]
+    facts = dataset.attendance.frame
+    lookup = min(_timed_ms(lambda: dataset.schools.school(school)) for _ in range(20))
+    scan = min(_timed_ms(lambda: facts[facts.index.get_level_values("School_Name") == school]) for _ in range(5))
+    print(f"Partitioned {len(dataset.schools.names()):,} schools ({len(facts):,} attendance rows) in {build:,.0f} ms, "
+          f"{dataset.schools.nbytes() / 1e6:,.1f} MB")
+    print(f"Open one school: {lookup:,.2f} ms from its partition vs {scan:,.2f} ms scanning every row (best of 20 and 5 runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FCA dashboard pipeline on synthetic data.")
+    parser.add_argument("--schools", type=int, default=200, help="schools per level")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--terms", type=int, default=3)
+    parser.add_argument("--weeks", type=int, default=13, help="attendance weeks per term")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("memory", help="per-stage allocations for one rerun").set_defaults(func=run_memory)
+    commands.add_parser("warmup", help="default-view latency cold vs pre-warmed").set_defaults(func=run_warmup)
+    levels = commands.add_parser("levels", help="per-level figures serial vs thread pool")
+    levels.add_argument("--workers", type=int, default=4)
+    levels.add_argument("--repeat", type=int, default=3)
+    levels.set_defaults(func=run_levels)
+    payload = commands.add_parser("payload", help="serialized chart sizes, standard vs compact")
+    payload.add_argument("--trend-weeks", type=int, default=2)
+    payload.set_defaults(func=run_payload)
+    commands.add_parser("projections", help="batched next-term projection fit").set_defaults(func=run_projections)
+    commands.add_parser("cohorts", help="cohort progression over every school and grade").set_defaults(func=run_cohorts)
+    registers = commands.add_parser("registers", help="chunked learner register ingestion")
+    registers.add_argument("--learners", type=int, default=40, help="learners per school, grade and gender")
+    registers.add_argument("--chunk-rows", type=int, default=500_000)
+    registers.set_defaults(func=run_registers)
+    commands.add_parser("schools", help="per-school partitions vs full scans").set_defaults(func=run_schools)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
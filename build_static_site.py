@@ -0,0 +1,207 @@
+"""Pre-render the dashboard into a self-contained static HTML bundle.
+
+    python build_static_site.py --out site --zip
+
+Writes one page per year/term/week/level with the enrolment table, the
+attendance table and the per-level Plotly charts, plus an index page. All pages
+load a single shared copy of plotly.min.js from ``assets/``, so the bundle can
+be zipped, copied to a laptop and opened straight from disk with no server.
+Pages are rendered in parallel across CPU cores.
+"""
+import argparse
+import html
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from data_pipeline import (
+    ALL_LEVELS, DATA_PATH, load_dataset, summarize_enrolment, summarize_attendance,
+    level_frame, gender_rates, level_gender_rates, weekly_trends,
+)
+from views import (
+    table_css, enrolment_table_html, attendance_table_html, enrolment_gender_chart, attendance_rate_chart,
+    level_rate_chart, level_gender_chart, trend_chart,
+)
+
+LOGO_PATH = Path(__file__).resolve().parent / "assets" / "fca_logo1.png"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{root}assets/plotly.min.js"></script>
+{css}
+<style>
+body {{ font-family: 'Segoe UI', sans-serif; margin: 0; color: #222222; background-color: #f9f9f9; }}
+header {{ background-color: #004c6d; color: white; padding: 1rem 2rem; display: flex; align-items: center; gap: 1.5rem; }}
+header img {{ height: 56px; }}
+header a {{ color: white; }}
+main {{ padding: 1rem 2rem; }}
+nav a {{ margin-right: 0.75rem; }}
+</style>
+</head>
+<body>
+<header>{logo}<div><h1>{heading}</h1><a href="{root}index.html">All snapshots</a></div></header>
+<main>
+{body}
+<p><small>Data version {version}</small></p>
+</main>
+</body>
+</html>
+"""
+
+
+def page_name(year, term, week, level):
+    slug = re.sub(r"[^a-z0-9]+", "-", f"{year} term {term} {week} {level}".lower()).strip("-")
+    return f"{slug}.html"
+
+
+def figure_html(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False, config={"responsive": True})
+
+
+def render_page(data_path, out_dir, year, term, week, level, trend_weeks):
+    """Render one snapshot page; runs in a worker process."""
+    dataset = load_dataset(data_path)
+    school_order = dataset.school_order
+    levels = list(school_order) if level == ALL_LEVELS else [level]
+    parts = []
+
+    # ---- Enrolment ----
+    enrol_summary = summarize_enrolment(dataset.enrolment_rows(year, term, level), level, school_order)
+    parts.append(f"<h2>🏫 Enrolment Summary Table — {html.escape(level)}</h2>")
+    parts.append(enrolment_table_html(enrol_summary))
+    parts.append(figure_html(enrolment_gender_chart(enrol_summary)))
+
+    # ---- Attendance ----
+    filtered_df = dataset.week_rows(year, term, week)
+    attendance_summary = summarize_attendance(filtered_df, level, school_order)
+    parts.append(f"<h2>🧾 Attendance Summary Table — {html.escape(level)}</h2>")
+    parts.append(attendance_table_html(attendance_summary))
+    parts.append(figure_html(attendance_rate_chart(attendance_summary)))
+
+    genders = gender_rates(filtered_df, school_order)
+    for name in levels:
+        df_level = level_frame(filtered_df, name, school_order)
+        parts.append(f"<hr><h3>📊 {html.escape(name)} Attendance Charts — Term {term}, {html.escape(week)}</h3>")
+        parts.append(figure_html(level_rate_chart(df_level, name)))
+        parts.append(figure_html(level_gender_chart(level_gender_rates(genders, name), name)))
+
+    # ---- Weekly Trends ----
+    parts.append("<hr><h2>📈 Comparative Attendance Trends by Grade and Week</h2>")
+    term_df = dataset.term_rows(year, term)
+    for name in levels:
+        trend_df = weekly_trends(term_df, name, trend_weeks)
+        if trend_df.empty:
+            parts.append(f"<p>No data for {html.escape(name)} in the selected trend weeks.</p>")
+            continue
+        parts.append(figure_html(trend_chart(trend_df, name)))
+
+    title = f"{year} Term {term}, {week} — {level}"
+    logo = '<img src="../assets/fca_logo1.png" alt="FCA">' if LOGO_PATH.exists() else ""
+    page = PAGE_TEMPLATE.format(
+        title=html.escape(title),
+        heading=html.escape(f"FCA Schools Data Dashboard — {title}"),
+        root="../",
+        css=table_css("enrolment-table", "attendance-table"),
+        logo=logo,
+        body="\n".join(parts),
+        version=dataset.version,
+    )
+    path = Path(out_dir) / "pages" / page_name(year, term, week, level)
+    path.write_text(page, encoding="utf-8")
+    return path
+
+
+def snapshot_jobs(dataset):
+    """(year, term, week, level, trend weeks) for every combination the dashboard can show."""
+    levels = [ALL_LEVELS] + list(dataset.school_order)
+    jobs = []
+    for year in dataset.options.years:
+        for term in dataset.options.terms_by_year[year]:
+            weeks = dataset.weeks(year, term)[::-1]
+            for i, week in enumerate(weeks):
+                # Same default as the dashboard: the selected week and the one before it
+                trend_weeks = weeks[max(0, i - 1):i + 1]
+                for level in levels:
+                    jobs.append((int(year), term, week, level, trend_weeks))
+    return jobs
+
+
+def index_html(dataset, jobs):
+    rows = []
+    current = None
+    for year, term, week, level, _ in jobs:
+        if (year, term, week) != current:
+            if current is not None:
+                rows.append("</p>")
+            current = (year, term, week)
+            rows.append(f"<h3>{year} — Term {term}, {html.escape(week)}</h3><p>")
+        rows.append(f'<a href="pages/{page_name(year, term, week, level)}">{html.escape(level)}</a> ')
+    if current is not None:
+        rows.append("</p>")
+    logo = '<img src="assets/fca_logo1.png" alt="FCA">' if LOGO_PATH.exists() else ""
+    return PAGE_TEMPLATE.format(
+        title="FCA Schools Data Dashboard",
+        heading="FCA Schools Data Dashboard — Offline Snapshots",
+        root="",
+        css="",
+        logo=logo,
+        body="<nav>\n" + "\n".join(rows) + "\n</nav>",
+        version=dataset.version,
+    )
+
+
+def build_site(out_dir, data_path=DATA_PATH, jobs=None):
+    """Build the bundle in ``out_dir`` and return the number of pages written."""
+    from plotly.offline import get_plotlyjs
+
+    out_dir = Path(out_dir)
+    if out_dir.exists():
+        if any(out_dir.iterdir()) and not (out_dir / "index.html").exists():
+            raise SystemExit(f"Refusing to replace '{out_dir}': it is not empty and does not look like a snapshot bundle.")
+        shutil.rmtree(out_dir)
+    (out_dir / "pages").mkdir(parents=True)
+    (out_dir / "assets").mkdir()
+
+    # One shared Plotly bundle for every page
+    (out_dir / "assets" / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+    if LOGO_PATH.exists():
+        shutil.copy(LOGO_PATH, out_dir / "assets" / LOGO_PATH.name)
+
+    dataset = load_dataset(data_path)
+    page_jobs = snapshot_jobs(dataset)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(render_page, data_path, out_dir, year, term, week, level, trend_weeks)
+            for year, term, week, level, trend_weeks in page_jobs
+        ]
+        for future in futures:
+            future.result()
+
+    (out_dir / "index.html").write_text(index_html(dataset, page_jobs), encoding="utf-8")
+    return len(page_jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build offline HTML snapshots of the FCA dashboard.")
+    parser.add_argument("--out", type=Path, default=Path("site"), help="output directory (replaced if it exists)")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="enrolment/attendance workbook")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--zip", action="store_true", help="also write <out>.zip")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages = build_site(args.out, args.data, args.jobs)
+    print(f"Built {pages} pages in {args.out} ({time.perf_counter() - start:.1f}s)")
+    if args.zip:
+        archive = shutil.make_archive(str(args.out), "zip", root_dir=args.out)
+        print(f"Wrote {archive}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Cohort progression: how each grade's learners carry into the next grade a year later.
+
+Grade N in year Y is aligned with grade N+1 in year Y+1 at the same school,
+term for term, for every school and grade at once: the enrolment table is
+joined to itself shifted one grade and one year, so the whole history is one
+merge and a few column operations, whatever the number of schools.
+
+The progression rate is next year's enrolment in the next grade as a share of
+this year's enrolment in the grade (the cohort survival ratio), for boys,
+girls and all learners. Above 100% the cohort gained learners (transfers in,
+repeaters); "Learners Lost" is this year's count minus next year's, negative
+when the cohort grew. A step into another level at the same school (PP2 →
+Grade 1, Grade 6 → Grade 7) is a transition, the others progressions within
+a level. Steps with no enrolment for the next grade at that school the next
+year (a grade the school does not offer, a year not on record) are left out
+rather than counted as a total dropout.
+"""
+import numpy as np
+
+from data_pipeline import ALL_LEVELS, COUNT_COLS, SCHOOL_ORDER, ordered_schools
+
+# Grades in the order learners move through them; Form 1-4 are the 8-4-4 secondary classes
+GRADE_LADDERS = [
+    ["PP1", "PP2"] + [f"Grade {n}" for n in range(1, 13)],
+    [f"Form {n}" for n in range(1, 5)],
+]
+NEXT_GRADE = {grade: ladder[i + 1] for ladder in GRADE_LADDERS for i, grade in enumerate(ladder[:-1])}
+GRADE_RANK = {grade: rank for rank, grade in enumerate(grade for ladder in GRADE_LADDERS for grade in ladder)}
+COHORT_KEYS = ["School_Name", "Education_Level", "Grade_Level", "Year", "Term"]
+# Rate column -> the count it is taken from
+RATE_COLS = {"Boys Rate (%)": "Boys", "Girls Rate (%)": "Girls", "Progression Rate (%)": "Total"}
+COHORT_SUMMARY_COLS = ["Step", "Type", "Boys", "Girls", "Total", "Next_Total", "Learners Lost"] + list(RATE_COLS)
+
+
+def _add_rates(frame):
+    """Progression rates per gender and learners lost, from the summed counts."""
+    for rate_col, col in RATE_COLS.items():
+        start = frame[col]
+        frame[rate_col] = frame[f"Next_{col}"] / start.where(start > 0) * 100
+    frame["Learners Lost"] = frame["Total"] - frame["Next_Total"]
+    return frame
+
+
+def cohort_progression(dataset):
+    """Every school × grade × year × term cohort matched with the next grade the following year.
+
+    One row per cohort with this year's and next year's Boys/Girls/Total,
+    the rates and learners lost, ``Next_Year`` the year it arrived in.
+    """
+    counts = dataset.enrolment.frame.groupby(level=COHORT_KEYS)[COUNT_COLS].sum().reset_index()
+    start = counts.assign(Next_Grade=counts["Grade_Level"].map(NEXT_GRADE), Next_Year=counts["Year"] + 1)
+    following = counts.rename(columns={
+        "Education_Level": "Next_Level", "Grade_Level": "Next_Grade", "Year": "Next_Year",
+        **{col: f"Next_{col}" for col in COUNT_COLS},
+    })
+    # Grades without a next grade get a NaN key and match nothing
+    cohorts = start.merge(following, on=["School_Name", "Next_Grade", "Next_Year", "Term"])
+    cohorts["Step"] = cohorts["Grade_Level"] + " → " + cohorts["Next_Grade"]
+    cohorts["Type"] = np.where(cohorts["Education_Level"] == cohorts["Next_Level"], "Progression", "Transition")
+    cohorts["Rank"] = cohorts["Grade_Level"].map(GRADE_RANK)
+    return _add_rates(cohorts)
+
+
+def cohort_years(cohorts):
+    """{arrival year: terms with cohorts}, both ascending."""
+    pairs = cohorts[["Next_Year", "Term"]].drop_duplicates().sort_values(["Next_Year", "Term"])
+    return {int(year): list(rows["Term"]) for year, rows in pairs.groupby("Next_Year")}
+
+
+def _arrivals(cohorts, year, term, level):
+    """Cohorts that arrived in ``year``/``term``, starting from grades at ``level`` unless ALL LEVELS."""
+    rows = cohorts[(cohorts["Next_Year"] == int(year)) & (cohorts["Term"] == term)]
+    if level != ALL_LEVELS:
+        rows = rows[rows["Education_Level"] == level]
+    return rows
+
+
+def summarize_cohorts(cohorts, year, term, level=ALL_LEVELS):
+    """Rates per grade step over all schools for the cohorts arriving in ``year``/``term``, with a TOTAL row."""
+    rows = _arrivals(cohorts, year, term, level)
+    counts = COUNT_COLS + [f"Next_{col}" for col in COUNT_COLS]
+    summary = rows.groupby(["Rank", "Step", "Type"])[counts].sum().reset_index().drop(columns="Rank")
+    summary.loc[len(summary)] = ["TOTAL", ""] + list(rows[counts].sum())
+    return _add_rates(summary)[COHORT_SUMMARY_COLS]
+
+
+def cohort_grid(cohorts, year, term, level=ALL_LEVELS, school_order=SCHOOL_ORDER):
+    """School × grade step matrix of progression rates (schools in display order, steps in grade order)."""
+    rows = _arrivals(cohorts, year, term, level)
+    grid = rows.pivot_table(index="School_Name", columns=["Rank", "Step"], values="Progression Rate (%)",
+                            aggfunc="first").sort_index(axis=1)
+    grid.columns = grid.columns.get_level_values("Step")
+    schools = [school for school in ordered_schools(level, school_order) if school in grid.index]
+    return grid.reindex(schools + sorted(set(grid.index) - set(schools)))
@@ -0,0 +1,693 @@
+"""Data loading and aggregation shared by the FCA schools dashboards.
+
+Nothing in here imports Streamlit, so the numbers the dashboard shows can also
+be produced by the command-line tools (``api_server.py`` and friends).
+"""
+import hashlib
+import json
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+# ---- Source Workbook ----
+APP_DIR = Path(__file__).resolve().parent
+# The workbook, or a learner register CSV / directory of CSVs (see ``registers.py``)
+DATA_PATH = Path(os.environ.get(
+    "FCA_DATA_PATH",
+    APP_DIR / "School Enrolment&Attendance" / "Enrolment Data vs Attendance Report.xlsx",
+))
+# Further programmes' data, as {"Programme name": "path/to/workbook.xlsx"}
+PROGRAMMES_PATH = Path(os.environ.get("FCA_PROGRAMMES", APP_DIR / "programmes.json"))
+DEFAULT_PROGRAMME = "Kalobeyei Schools"
+# Memory budget for parsed datasets kept across reruns, in MB
+DATASET_CACHE_MB = float(os.environ.get("FCA_DATASET_CACHE_MB", 512))
+ENROLMENT_SHEET = "Enrolment Data"
+ATTENDANCE_SHEET = "Attendance Report"
+
+COUNT_COLS = ["Boys", "Girls", "Total"]
+COMMON_COLS = ["School_Name", "Grade_Level", "Education_Level", "Term", "Year"]
+ATTENDANCE_COLS = ["Boys_Attendance", "Girls_Attendance", "Total_Attendance",
+                   "Boys_Enrolment", "Girls_Enrolment", "Total_Enrolment"]
+# Hierarchical keys the tables are sorted under; any leading run of them is a binary-search slice
+ENROLMENT_KEYS = ["Year", "Term", "Education_Level", "Grade_Level", "School_Name"]
+FACT_KEYS = ["Year", "Term", "Attendance_Week", "Education_Level", "School_Name", "Grade_Level"]
+# Columns the per-level charts read; level_frame copies only these
+LEVEL_FRAME_COLS = ["School_Name", "Education_Level", "Grade_Level", "Attendance Rate (%)"] + ATTENDANCE_COLS
+
+ALL_LEVELS = "ALL LEVELS"
+LEVELS = ["ECDE", "Primary", "Junior", "Secondary"]
+SCHOOL_ORDER = {
+    "ECDE": ["Kalobeyei Morning Star Sch", "Kalobeyei Settlement Sch", "Kalobeyei Friends Sch", "Joy Sch", "Future Sch", "Bright Sch", "Nationokar Sch", "Esikiriat Sch"],
+    "Primary": ["Kalobeyei Morning Star Sch", "Kalobeyei Settlement Sch", "Kalobeyei Friends Sch", "Joy Sch", "Future Sch", "Bright Sch", "Nationokar Sch", "Esikiriat Sch"],
+    "Junior": ["Kalobeyei Morning Star Sch", "Kalobeyei Settlement Sch", "Kalobeyei Friends Sch", "Joy Sch", "Future Sch", "Bright Sch", "Nationokar Sch", "Esikiriat Sch"],
+    "Secondary": ["Kalobeyei Settlement Secondary", "Brightstar Integrated Secondary", "The Big Heart Foundation Girls"]
+}
+
+
+# ---- Helpers ----
+def week_number(week):
+    """Numeric part of an ``Attendance_Week`` label such as ``"Week 12"``."""
+    return int(str(week).split()[-1])
+
+
+def rate_label(rates):
+    """Whole-percent labels (``"87%"``) for a Series of rates."""
+    return rates.fillna(0).round(0).astype(int).astype(str) + "%"
+
+
+def ordered_schools(level, school_order=SCHOOL_ORDER):
+    """Schools for ``level`` in display order; ALL LEVELS keeps ECDE → Secondary order without duplicates."""
+    if level != ALL_LEVELS:
+        return list(school_order[level])
+    seen = set()
+    ordered_all = []
+    for schools in school_order.values():
+        for school in schools:
+            if school not in seen:
+                ordered_all.append(school)
+                seen.add(school)
+    return ordered_all
+
+
+def school_order_for(enrol_df):
+    """``SCHOOL_ORDER`` when it covers every school in ``enrol_df``, else each level's schools as first listed."""
+    pairs = enrol_df[["Education_Level", "School_Name"]].dropna().drop_duplicates()
+    known = {(level, school) for level, schools in SCHOOL_ORDER.items() for school in schools}
+    if set(pairs.itertuples(index=False, name=None)) <= known:
+        return SCHOOL_ORDER
+    levels = [level for level in LEVELS if level in set(pairs["Education_Level"])]
+    levels += sorted(set(pairs["Education_Level"]) - set(levels))
+    return {level: list(pairs.loc[pairs["Education_Level"] == level, "School_Name"]) for level in levels}
+
+
+# ---- Programmes ----
+def read_programmes(path=PROGRAMMES_PATH):
+    """{programme name: data path}: the default workbook first, then every programme in ``path``.
+
+    Relative paths in the file are taken from the file's own directory. A
+    missing or unreadable file leaves just the default programme.
+    """
+    path = Path(path)
+    programmes = {DEFAULT_PROGRAMME: DATA_PATH}
+    try:
+        listed = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return programmes
+    for name, data_path in listed.items():
+        programmes[name] = path.parent / data_path
+    return programmes
+
+
+PROGRAMMES = read_programmes()
+
+
+# ---- Loading ----
+_versions = {}
+_lock = threading.Lock()
+
+
+def source_files(path=DATA_PATH):
+    """The files behind ``path``: the file itself, or every ``*.csv`` register in a directory, sorted."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob("*.csv"))
+    return [path]
+
+
+def data_version(path=DATA_PATH):
+    """Short content hash of the workbook (or of every register file).
+
+    The hash is memoised on (path, mtime, size) of each file, so asking for the
+    version of unchanged data only costs ``stat`` calls. Files are hashed in
+    blocks, so a large register is never read into memory whole.
+    """
+    files = source_files(path)
+    key = tuple((str(file), file.stat().st_mtime_ns, file.stat().st_size) for file in files)
+    if not key:
+        raise FileNotFoundError(f"No register files in {path}")
+    with _lock:
+        version = _versions.get(key)
+    if version is None:
+        digest = hashlib.sha256()
+        for file in files:
+            with open(file, "rb") as handle:
+                for block in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(block)
+        version = digest.hexdigest()[:16]
+        with _lock:
+            _versions[key] = version
+    return version
+
+
+def read_workbook(path=DATA_PATH):
+    """Parse both sheets and coerce the count columns to numbers."""
+    xls = pd.ExcelFile(path)
+    enrol_df = xls.parse(ENROLMENT_SHEET)
+    attend_df = xls.parse(ATTENDANCE_SHEET)
+
+    for df in [enrol_df, attend_df]:
+        for col in COUNT_COLS:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return enrol_df, attend_df
+
+
+def merge_attendance(enrol_df, attend_df):
+    """Join attendance to enrolment per school/grade/term and add the grade-level rate.
+
+    Rate labels are not stored here: they are only needed for the handful of
+    rows a chart shows, and a string per row would be the largest column.
+    """
+    merged_df = pd.merge(attend_df, enrol_df, on=COMMON_COLS, suffixes=("_Attendance", "_Enrolment"))
+
+    rate = merged_df["Total_Attendance"] / merged_df["Total_Enrolment"]
+    rate *= 100
+    merged_df["Attendance Rate (%)"] = rate.fillna(0)
+    return merged_df
+
+
+class FactIndex:
+    """A table kept sorted under a hierarchical index.
+
+    Filtering on any leading run of the keys (Year, then Term, then Week, ...)
+    is two binary searches on the sorted index plus a positional slice, rather
+    than a boolean comparison over every row.
+    """
+
+    def __init__(self, df, keys):
+        self.keys = list(keys)
+        self.frame = df.set_index(self.keys).sort_index()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _locate(self, key):
+        if not key:
+            return 0, len(self.frame)
+        return self.frame.index.slice_locs(key, key)
+
+    def rows(self, *key):
+        """Flat rows whose leading index levels equal ``key``, e.g. ``rows(2025, 2, "Week 12")``."""
+        start, stop = self._locate(key)
+        return self.frame.iloc[start:stop].reset_index()
+
+    def values(self, level, *key):
+        """Sorted distinct values of index ``level`` among the rows under ``key``."""
+        position = self.keys.index(level)
+        if not key:
+            return list(self.frame.index.levels[position])
+        start, stop = self._locate(key)
+        return sorted(self.frame.index[start:stop].get_level_values(position).dropna().unique())
+
+
+def _children(keys):
+    """``{parent: sorted child values}`` from ``(parent, child)`` pairs."""
+    children = {}
+    for parent, child in keys:
+        children.setdefault(parent, set()).add(child)
+    return {parent: sorted(values) for parent, values in children.items()}
+
+
+def _complete(paths):
+    """Filter paths with no missing key, so the option lists never offer a blank."""
+    return [path for path in paths if not any(pd.isna(value) for value in path)]
+
+
+class FilterOptions:
+    """Every sidebar option list, built once per data version.
+
+    Each cascading dropdown maps its parent selection to the ordered child
+    options (year → terms → weeks, level → grades), so populating the sidebar
+    is a dictionary lookup however many rows the data has.
+    """
+
+    def __init__(self, enrolment, attendance):
+        # Distinct filter paths only: a few hundred tuples, not one per row
+        enrol_paths = _complete(enrolment.frame.index.droplevel("School_Name").unique())
+        week_paths = _complete(attendance.frame.index.droplevel(["Education_Level", "School_Name", "Grade_Level"]).unique())
+
+        self.enrol_years = enrolment.values("Year")
+        self.enrol_terms = enrolment.values("Term")
+        self.edu_levels = enrolment.values("Education_Level")
+        self.enrol_terms_by_year = _children((year, term) for year, term, _, _ in enrol_paths)
+        self.grades_by_level = _children((level, grade) for _, _, level, grade in enrol_paths)
+        self.grades_by_term = _children(((year, term, level), grade) for year, term, level, grade in enrol_paths)
+
+        self.years = attendance.values("Year")
+        self.terms = attendance.values("Term")
+        self.terms_by_year = _children((year, term) for year, term, _ in week_paths)
+        self.weeks_by_term = {
+            key: sorted(weeks, key=week_number, reverse=True)
+            for key, weeks in _children(((year, term), week) for year, term, week in week_paths).items()
+        }
+
+
+SCHOOL_KEYS = ["Year", "Term", "Education_Level", "Grade_Level"]
+# Rate column -> the gender prefix of its attendance and enrolment counts
+SCHOOL_RATE_COLS = {"Boys Rate (%)": "Boys", "Girls Rate (%)": "Girls", "Attendance Rate (%)": "Total"}
+
+
+def _by_school(df):
+    """(``df`` sorted by school without the School_Name column, ``{school: (start, stop)}`` row ranges)."""
+    df = df.sort_values("School_Name", kind="stable", ignore_index=True)
+    schools = df.pop("School_Name")
+    # First row of each school in the sorted column, and the end of its run
+    starts = schools.ne(schools.shift()).to_numpy().nonzero()[0]
+    stops = list(starts[1:]) + [len(df)]
+    return df, {schools.iat[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+
+class SchoolPartitions:
+    """Every table the school drill-down shows, partitioned by school once per data version.
+
+    The summaries are computed for all schools in one grouped pass over the
+    sorted tables, and each table is stored sorted by school with the row
+    range of every school. Opening a school is a dictionary lookup and a
+    slice of its own rows, whatever the number of other schools.
+
+    - ``grades``: enrolment per year/term/level/grade, with the average weekly
+      attendance over the term's recorded weeks and its rate
+    - ``weeks``: attendance and enrolment per attendance week with Boys, Girls
+      and overall rates, in time order
+    - ``terms``: enrolment per year/term with the mean of that term's weekly rates
+    """
+
+    def __init__(self, enrolment, attendance):
+        enrol = enrolment.frame.reset_index()
+        facts = attendance.frame
+
+        average = facts.groupby(level=["School_Name"] + SCHOOL_KEYS)["Total_Attendance"].mean()
+        grades = enrol.join(average.rename("Average Attendance"), on=["School_Name"] + SCHOOL_KEYS)
+        grades["Attendance Rate (%)"] = grades["Average Attendance"] / grades["Total"].where(grades["Total"] != 0) * 100
+
+        weeks = facts.groupby(level=["School_Name", "Year", "Term", "Attendance_Week"])[ATTENDANCE_COLS].sum().reset_index()
+        for rate_col, prefix in SCHOOL_RATE_COLS.items():
+            enrolled = weeks[f"{prefix}_Enrolment"]
+            weeks[rate_col] = weeks[f"{prefix}_Attendance"] / enrolled.where(enrolled != 0) * 100
+        weeks["Week"] = weeks["Attendance_Week"].map({week: week_number(week) for week in weeks["Attendance_Week"].unique()})
+        weeks = weeks.sort_values(["School_Name", "Year", "Term", "Week"], ignore_index=True)
+
+        terms = enrol.groupby(["School_Name", "Year", "Term"])[COUNT_COLS].sum()
+        terms = terms.join(weeks.groupby(["School_Name", "Year", "Term"])[list(SCHOOL_RATE_COLS)].mean()).reset_index()
+
+        self.tables = [_by_school(table) for table in [grades, weeks, terms]]
+
+    def names(self, school_order=SCHOOL_ORDER):
+        """Schools with enrolment on record, in display order."""
+        ranges = self.tables[0][1]
+        ordered = [school for school in ordered_schools(ALL_LEVELS, school_order) if school in ranges]
+        return ordered + sorted(set(ranges) - set(ordered))
+
+    def school(self, name):
+        """(grades, weeks, terms) for one school; no rows when it has none."""
+        parts = []
+        for df, ranges in self.tables:
+            start, stop = ranges.get(name, (0, 0))
+            parts.append(df.iloc[start:stop].reset_index(drop=True))
+        return tuple(parts)
+
+    def nbytes(self):
+        return sum(int(df.memory_usage(index=True, deep=True).sum()) for df, _ in self.tables)
+
+
+class Dataset:
+    """Sorted enrolment and merged attendance tables for one workbook version."""
+
+    def __init__(self, version, enrol_df, attend_df, school_order=SCHOOL_ORDER):
+        self.version = version
+        self.school_order = school_order
+        self.enrolment = FactIndex(enrol_df, ENROLMENT_KEYS)
+        self.attendance = FactIndex(merge_attendance(enrol_df, attend_df), FACT_KEYS)
+        self.options = FilterOptions(self.enrolment, self.attendance)
+        self.schools = SchoolPartitions(self.enrolment, self.attendance)
+
+    def enrolment_rows(self, year, term, level=ALL_LEVELS, grade=None):
+        """Enrolment rows for a year/term, narrowed to a level and grade when given."""
+        key = [int(year), term]
+        if level != ALL_LEVELS:
+            key.append(level)
+            if grade is not None:
+                key.append(grade)
+        return self.enrolment.rows(*key)
+
+    def grade_choices(self, level, year=None, term=None):
+        """Grades offered at ``level``, for one year/term when both are given."""
+        if year is not None and term is not None:
+            return self.options.grades_by_term.get((int(year), term, level), [])
+        return self.options.grades_by_level.get(level, [])
+
+    def week_rows(self, year, term, week, level=ALL_LEVELS):
+        """Merged rows for one attendance week, narrowed to a level when given."""
+        key = [int(year), term, week]
+        if level != ALL_LEVELS:
+            key.append(level)
+        return self.attendance.rows(*key)
+
+    def term_rows(self, year, term):
+        """Merged rows for every week of one year/term."""
+        return self.attendance.rows(int(year), term)
+
+    def weeks(self, year, term):
+        """Attendance weeks recorded for a year/term, newest first."""
+        return self.options.weeks_by_term.get((int(year), term), [])
+
+    def nbytes(self):
+        """Memory held by the two sorted tables (index included) and the per-school partitions."""
+        return self.schools.nbytes() + sum(int(table.frame.memory_usage(index=True, deep=True).sum())
+                                           for table in [self.enrolment, self.attendance])
+
+
+class DatasetCache:
+    """LRU of parsed datasets by path, bounded by their in-memory size.
+
+    Adding a dataset evicts the least recently used ones until the total fits
+    ``budget_mb``; the newest dataset is always kept, even on its own over
+    budget. A dataset whose source has changed is replaced, not counted as
+    an eviction.
+    """
+
+    def __init__(self, budget_mb=DATASET_CACHE_MB):
+        self.budget = budget_mb * 1e6
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            dataset = self.entries.get(key)
+            if dataset is not None and dataset.version == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return dataset
+            self.misses += 1
+            return None
+
+    def __contains__(self, key):
+        """Whether ``key`` is loaded, in any version; neither counted nor marked as used."""
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, dataset):
+        size = dataset.nbytes()
+        with self.lock:
+            self.entries[key] = dataset
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            while len(self.entries) > 1 and sum(self.sizes.values()) > self.budget:
+                evicted, _ = self.entries.popitem(last=False)
+                del self.sizes[evicted]
+                self.evictions += 1
+
+    def stats(self):
+        """Counters and current contents, for diagnostics."""
+        with self.lock:
+            return {
+                "datasets": len(self.entries),
+                "size_mb": sum(self.sizes.values()) / 1e6,
+                "budget_mb": self.budget / 1e6,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+DATASETS = DatasetCache()
+
+
+def load_dataset(path=DATA_PATH):
+    """Return the parsed dataset for ``path``, re-reading it only when its content changes or it was evicted.
+
+    Each read also records an immutable snapshot of the tables (see ``snapshots.py``).
+    """
+    path = Path(path)
+    version = data_version(path)
+    dataset = DATASETS.get(str(path), version)
+    if dataset is not None:
+        return dataset
+
+    if path.is_dir() or path.suffix.lower() == ".csv":
+        from registers import read_registers  # registers imports this module
+        enrol_df, attend_df = read_registers(path)
+    else:
+        enrol_df, attend_df = read_workbook(path)
+    dataset = Dataset(version, enrol_df, attend_df, school_order=school_order_for(enrol_df))
+    DATASETS.put(str(path), dataset)
+
+    from snapshots import take_snapshot  # snapshots imports this module
+    # The dashboard works without history, so a snapshot that cannot be written never stops a load:
+    # a read-only deploy (OSError) or a column Parquet cannot store (pyarrow's errors subclass the others)
+    try:
+        take_snapshot(enrol_df, attend_df, source=path)
+    except (OSError, ValueError, TypeError, NotImplementedError) as exc:
+        warnings.warn(f"Snapshot of {path.name} skipped: {exc}", RuntimeWarning)
+    return dataset
+
+
+# ---- Enrolment ----
+def summarize_enrolment(enrol_rows, level, school_order=SCHOOL_ORDER):
+    """Per-school Boys/Girls/Total enrolment in display order, with a trailing TOTAL row.
+
+    ``enrol_rows`` are the rows for one year/term (and level/grade), see
+    ``Dataset.enrolment_rows``; ``level`` may be ALL LEVELS.
+    """
+    summary = enrol_rows.groupby("School_Name")[COUNT_COLS].sum().reset_index()
+
+    schools = ordered_schools(level, school_order)
+    school_df = pd.DataFrame(schools, columns=["School_Name"])
+    summary = school_df.merge(summary, on="School_Name", how="left").fillna(0)
+
+    summary["School_Name"] = pd.Categorical(summary["School_Name"], categories=schools + ["TOTAL"], ordered=True)
+    summary = summary.sort_values("School_Name").reset_index(drop=True)
+
+    total_row = pd.DataFrame({
+        "School_Name": ["TOTAL"],
+        "Boys": [summary["Boys"].sum()],
+        "Girls": [summary["Girls"].sum()],
+        "Total": [summary["Total"].sum()]
+    })
+    return pd.concat([summary, total_row], ignore_index=True)
+
+
+# ---- Attendance ----
+def summarize_attendance(filtered_df, level, school_order=SCHOOL_ORDER):
+    """Per-school attendance and enrolment sums with the attendance rate and a TOTAL row.
+
+    ``filtered_df`` is one week of the merged table (see ``Dataset.week_rows``). The
+    rate is left as a float (NaN where nobody is enrolled) rounded to 1 dp.
+    """
+    if level == ALL_LEVELS:
+        mask = filtered_df["Education_Level"].isin(school_order.keys())
+    else:
+        mask = filtered_df["Education_Level"] == level
+    df_level_attendance = filtered_df.loc[mask, ["School_Name"] + ATTENDANCE_COLS]
+
+    # Maintain school order as in enrolment section
+    schools_df = pd.DataFrame(ordered_schools(level, school_order), columns=["School_Name"])
+    df_level_attendance = schools_df.merge(df_level_attendance, on="School_Name", how="left")
+
+    # Group and summarize attendance by school
+    summary = df_level_attendance.groupby("School_Name")[ATTENDANCE_COLS].sum().reset_index()
+
+    total_row = {"School_Name": "TOTAL"}
+    for col in ATTENDANCE_COLS:
+        total_row[col] = summary[col].sum()
+    summary = pd.concat([summary, pd.DataFrame([total_row])], ignore_index=True)
+
+    summary["Attendance Rate (%)"] = (
+        summary["Total_Attendance"] /
+        summary["Total_Enrolment"].where(summary["Total_Enrolment"] != 0)
+    ) * 100
+    summary["Attendance Rate (%)"] = summary["Attendance Rate (%)"].round(1)
+    return summary
+
+
+def level_frame(filtered_df, level, school_order=SCHOOL_ORDER):
+    """One week of merged rows for ``level`` on a skeleton of its schools, gaps filled for charting."""
+    df_level = filtered_df.loc[filtered_df["Education_Level"] == level, LEVEL_FRAME_COLS]
+    schools_df = pd.DataFrame(school_order[level], columns=["School_Name"])
+    df_level = schools_df.merge(df_level, on="School_Name", how="left")
+
+    for col in ["Attendance Rate (%)", "Total_Attendance", "Total_Enrolment", "Grade_Level"]:
+        df_level[col] = df_level[col].fillna(0 if col != "Grade_Level" else "N/A")
+    df_level["Rate_Label"] = rate_label(df_level["Attendance Rate (%)"])
+
+    for col in ["Boys_Attendance", "Girls_Attendance", "Boys_Enrolment", "Girls_Enrolment"]:
+        df_level[col] = df_level[col].fillna(0)
+    return df_level
+
+
+# Gender label -> column prefix of the merged attendance/enrolment counts
+GENDER_PREFIXES = {"Boys": "Boys", "Girls": "Girls", "Average": "Total"}
+GENDER_COLS = ["Education_Level", "School_Name", "Gender", "Attendance", "Enrolment", "Rate", "Label"]
+
+
+def gender_rates(filtered_df, school_order=SCHOOL_ORDER):
+    """Boys, Girls and Average attendance rates per school for every level, in long layout with labels.
+
+    One groupby over the week's rows gives all six sums per level and school;
+    the rates for all three genders are then computed together. Every school
+    in ``school_order`` gets a row (zeros when it has no data). Within a level
+    rows run Boys, Girls, Average, schools alphabetical within each.
+    """
+    count_cols = [f"{prefix}_{kind}" for prefix in GENDER_PREFIXES.values() for kind in ("Attendance", "Enrolment")]
+    sums = filtered_df.groupby(["Education_Level", "School_Name"])[count_cols].sum()
+    skeleton = pd.MultiIndex.from_tuples(
+        [(level, school) for level, schools in school_order.items() for school in sorted(set(schools))],
+        names=["Education_Level", "School_Name"],
+    )
+    sums = sums.reindex(skeleton, fill_value=0).reset_index()
+
+    combined = pd.concat([
+        sums[["Education_Level", "School_Name"]].assign(
+            Gender=gender, Attendance=sums[f"{prefix}_Attendance"], Enrolment=sums[f"{prefix}_Enrolment"]
+        )
+        for gender, prefix in GENDER_PREFIXES.items()
+    ], ignore_index=True)
+    enrolment = combined["Enrolment"]
+    combined["Rate"] = (combined["Attendance"] / enrolment.where(enrolment != 0) * 100).fillna(0)
+    combined["Label"] = rate_label(combined["Rate"])
+
+    # Level blocks in display order; the stable sort keeps gender-then-school order inside each
+    level_position = combined["Education_Level"].map({level: i for i, level in enumerate(school_order)})
+    return combined.iloc[level_position.argsort(kind="stable")].reset_index(drop=True)[GENDER_COLS]
+
+
+def level_gender_rates(combined, level):
+    """The rows of ``gender_rates`` for one level."""
+    return combined[combined["Education_Level"] == level].reset_index(drop=True)
+
+
+# ---- Trends ----
+def default_trend_weeks(weeks, count=2):
+    """The ``count`` most recent of ``weeks``, newest first."""
+    return sorted(weeks, key=week_number, reverse=True)[:count]
+
+
+TREND_COLS = ["School_Name", "Grade_Level", "Attendance_Week", "Attendance_Rate", "Label"]
+
+
+def weekly_trends(rows, level, weeks):
+    """Mean grade attendance rate per school/grade/week for the selected trend weeks.
+
+    ``rows`` are merged rows for one year/term (see ``Dataset.term_rows``).
+
+    ``Attendance_Week`` comes back as a categorical ordered newest → oldest so
+    stacked bars put the latest week on top.
+    """
+    by_level = weekly_trends_by_level(rows[rows["Education_Level"] == level], weeks)
+    return by_level.get(level, pd.DataFrame(columns=TREND_COLS))
+
+
+def weekly_trends_by_level(rows, weeks):
+    """``weekly_trends`` for every level from one groupby: ``{level: trend frame}`` for the levels with rows."""
+    trend_df = rows.loc[
+        rows["Attendance_Week"].isin(weeks),
+        ["Education_Level", "School_Name", "Grade_Level", "Attendance_Week", "Attendance Rate (%)"],
+    ]
+    if trend_df.empty:
+        return {}
+
+    trend_df = trend_df.groupby(["Education_Level", "School_Name", "Grade_Level", "Attendance_Week"]).agg(
+        Attendance_Rate=("Attendance Rate (%)", "mean")
+    ).reset_index()
+
+    # Order weeks on the (small) grouped result rather than the filtered rows
+    ordered_weeks = sorted(weeks, key=week_number, reverse=True)
+    trend_df["Attendance_Week"] = pd.Categorical(trend_df["Attendance_Week"], categories=ordered_weeks, ordered=True)
+    trend_df = trend_df.sort_values(["Education_Level", "School_Name", "Grade_Level", "Attendance_Week"])
+
+    trend_df["Label"] = rate_label(trend_df["Attendance_Rate"])
+    return {
+        level: level_df[TREND_COLS].reset_index(drop=True)
+        for level, level_df in trend_df.groupby("Education_Level", sort=False)
+    }
+
+
+def weekly_attendance(rows, level):
+    """Total attendance per week and school, weeks as an ordered categorical.
+
+    ``rows`` are merged rows for one year/term (see ``Dataset.term_rows``).
+    """
+    trend_df = rows
+    if level != ALL_LEVELS:
+        trend_df = rows.loc[rows["Education_Level"] == level, ["Attendance_Week", "School_Name", "Total_Attendance"]]
+
+    weekly = (
+        trend_df.groupby(["Attendance_Week", "School_Name"])["Total_Attendance"]
+        .sum()
+        .reset_index()
+    )
+
+    week_order = sorted(weekly["Attendance_Week"].unique(), key=week_number)
+    weekly["Attendance_Week"] = pd.Categorical(weekly["Attendance_Week"], categories=week_order, ordered=True)
+    # Plotly draws lines in row order, so the rows must follow the week order too
+    return weekly.sort_values(["Attendance_Week", "School_Name"], ignore_index=True)
+
+
+# ---- Long-Range History ----
+# Beyond this many attendance weeks the long-range trend is shown per term
+LONG_RANGE_WEEKS = 52
+HISTORY_COLS = ["School_Name", "Period", "Position", "Total_Attendance"]
+
+
+def attendance_history(dataset, level=ALL_LEVELS, grain=None):
+    """Total attendance per school for every year/term/week in the data.
+
+    ``grain="week"`` keeps one point per attendance week, ``"term"`` averages
+    the weekly totals of each term and ``None`` picks ``"term"`` once the data
+    spans more than ``LONG_RANGE_WEEKS`` weeks. Returns ``(history, grain)``;
+    ``Position`` orders the periods (``"2025 T2 W12"`` or ``"2025 T2"``) in time.
+    """
+    frame = dataset.attendance.frame
+    if level != ALL_LEVELS:
+        frame = frame[frame.index.get_level_values("Education_Level") == level]
+    # Aggregate on the sorted index; no per-row copy of the fact table
+    weekly = (
+        frame.groupby(level=["Year", "Term", "Attendance_Week", "School_Name"])["Total_Attendance"]
+        .sum()
+        .reset_index()
+    )
+    weekly["Week"] = weekly["Attendance_Week"].map(week_number)
+
+    if grain is None:
+        grain = "term" if len(weekly[["Year", "Term", "Week"]].drop_duplicates()) > LONG_RANGE_WEEKS else "week"
+    if grain == "term":
+        history = weekly.groupby(["Year", "Term", "School_Name"], as_index=False)["Total_Attendance"].mean()
+        period_keys = ["Year", "Term"]
+        history["Period"] = history["Year"].astype(str) + " T" + history["Term"].astype(str)
+    else:
+        history = weekly
+        period_keys = ["Year", "Term", "Week"]
+        history["Period"] = (
+            history["Year"].astype(str) + " T" + history["Term"].astype(str) + " W" + history["Week"].astype(str)
+        )
+    history["Position"] = history.groupby(period_keys, sort=True).ngroup()
+    history = history.sort_values(["School_Name", "Position"], ignore_index=True)
+    return history[HISTORY_COLS], grain
+
+
+def downsample_minmax(history, max_points=200):
+    """At most ``max_points`` per school: the lowest and highest point of each run of consecutive periods.
+
+    Keeping both extremes of every bucket preserves the spikes and dips a
+    line chart would show, while the points sent stay bounded however many
+    weeks exist. ``history`` must be sorted by school then ``Position``.
+    """
+    schools = history["School_Name"]
+    sizes = schools.map(schools.value_counts())
+    long = sizes > max_points
+    if not long.any():
+        return history
+
+    rank = history.groupby("School_Name").cumcount()
+    bucket = rank * (max_points // 2) // sizes
+    grouped = history.loc[long, "Total_Attendance"].groupby([schools[long], bucket[long]])
+    keep = pd.Index(grouped.idxmin().dropna()).union(pd.Index(grouped.idxmax().dropna()))
+    kept = history.index[~long].union(keep)
+    return history.loc[kept].sort_values(["School_Name", "Position"], ignore_index=True)
@@ -0,0 +1,167 @@
+"""Quarterly donor report: one Excel workbook per term, built from the dashboard's aggregates.
+
+    python donor_report.py --out reports
+    python donor_report.py --out reports --all-terms
+
+Each workbook has an "All Levels" sheet and one sheet per education level. A
+sheet holds the per-school enrolment table, the attendance table for the
+term's latest week (or ``--week``) and, on the level sheets, the Boys/Girls/
+Average attendance rates, each with its TOTAL row, computed by the same
+functions the dashboard uses.
+
+Numbers are written as numbers with Excel number formats (thousands
+separators, percentages), so the tables can be summed and charted in Excel.
+The workbooks are written with openpyxl's write-only mode, which streams rows
+to disk as they are produced: memory stays flat however many terms and
+schools a batch covers.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+from data_pipeline import (
+    ALL_LEVELS, COUNT_COLS, DATA_PATH, GENDER_PREFIXES, load_dataset, ordered_schools,
+    summarize_enrolment, summarize_attendance, gender_rates, level_gender_rates,
+)
+
+COUNT_FORMAT = "#,##0"
+RATE_FORMAT = "0.0%"
+ATTENDANCE_COLUMNS = {
+    "School_Name": "School",
+    "Boys_Attendance": "Boys Attending",
+    "Girls_Attendance": "Girls Attending",
+    "Total_Attendance": "Total Attending",
+    "Total_Enrolment": "Total Enrolment",
+    "Attendance Rate (%)": "Attendance Rate",
+}
+COLUMN_WIDTHS = [38, 16, 16, 16, 16, 16]
+
+# The dashboard's table colours (see views.TABLE_CSS)
+_HEADER = {"font": Font(bold=True, color="FFFFFF"), "fill": PatternFill("solid", fgColor="004C6D"),
+           "alignment": Alignment(horizontal="center")}
+_TOTAL = {"font": Font(bold=True), "fill": PatternFill("solid", fgColor="E0F7E9"),
+          "border": Border(top=Side(style="medium", color="006C4E"))}
+_TITLE = {"font": Font(bold=True, size=14)}
+_SECTION = {"font": Font(bold=True, size=12, color="004C6D")}
+
+
+def _cell(ws, value, number_format=None, **style):
+    cell = WriteOnlyCell(ws, value=value)
+    if number_format:
+        cell.number_format = number_format
+    for name, setting in style.items():
+        setattr(cell, name, setting)
+    return cell
+
+
+def _table_rows(ws, title, table, formats):
+    """Rows for one titled table: section title, header, body, TOTAL row styled as in the dashboard, blank line."""
+    yield [_cell(ws, title, **_SECTION)]
+    yield [_cell(ws, name, **_HEADER) for name in table.columns]
+    for values in table.itertuples(index=False):
+        style = _TOTAL if values[0] == "TOTAL" else {}
+        # NaN (no enrolment) is left as an empty cell rather than written as a number
+        yield [_cell(ws, None if pd.isna(value) else value, number_format, **style)
+               for value, number_format in zip(values, formats)]
+    yield []
+
+
+# ---- Tables ----
+def enrolment_table(dataset, year, term, level):
+    summary = summarize_enrolment(dataset.enrolment_rows(year, term, level), level, dataset.school_order)
+    return summary.rename(columns={"School_Name": "School"}), [None] + [COUNT_FORMAT] * len(COUNT_COLS)
+
+
+def attendance_table(week_rows, level, school_order):
+    summary = summarize_attendance(week_rows, level, school_order)
+    summary["Attendance Rate (%)"] = (summary["Attendance Rate (%)"] / 100).round(3)
+    table = summary[list(ATTENDANCE_COLUMNS)].rename(columns=ATTENDANCE_COLUMNS)
+    return table, [None] + [COUNT_FORMAT] * 4 + [RATE_FORMAT]
+
+
+def gender_table(genders, level, school_order):
+    """Boys/Girls/Average rate per school in display order, with a TOTAL row from the summed counts."""
+    rows = level_gender_rates(genders, level)
+    sums = rows.pivot_table(index="School_Name", columns="Gender", values=["Attendance", "Enrolment"], aggfunc="sum")
+    sums.loc["TOTAL"] = sums.sum()
+    sums = sums.reindex(ordered_schools(level, school_order) + ["TOTAL"])
+    rates = sums["Attendance"] / sums["Enrolment"].where(sums["Enrolment"] != 0)
+    table = rates[list(GENDER_PREFIXES)].rename(columns=lambda gender: f"{gender} Rate")
+    return table.rename_axis("School").reset_index(), [None] + [RATE_FORMAT] * len(GENDER_PREFIXES)
+
+
+# ---- Workbook ----
+def write_report(dataset, year, term, path, week=None):
+    """Write the report for one year/term to ``path``; returns the attendance week used (None if none)."""
+    weeks = dataset.weeks(year, term)
+    week = week if week in weeks else (weeks[0] if weeks else None)
+    week_rows = dataset.week_rows(year, term, week) if week else None
+    genders = gender_rates(week_rows, dataset.school_order) if week else None
+
+    wb = Workbook(write_only=True)
+    for level in [ALL_LEVELS] + list(dataset.school_order):
+        ws = wb.create_sheet(title="All Levels" if level == ALL_LEVELS else level)
+        for column, width in zip("ABCDEF", COLUMN_WIDTHS):
+            ws.column_dimensions[column].width = width
+
+        heading = "All Levels" if level == ALL_LEVELS else level
+        ws.append([_cell(ws, f"FCA Schools — {heading} — Term {term}, {year}", **_TITLE)])
+        ws.append([f"Data version {dataset.version}"])
+        ws.append([])
+
+        for row in _table_rows(ws, "Enrolment", *enrolment_table(dataset, year, term, level)):
+            ws.append(row)
+        if week is None:
+            ws.append(["No attendance recorded this term."])
+            continue
+        table, formats = attendance_table(week_rows, level, dataset.school_order)
+        for row in _table_rows(ws, f"Attendance — {week}", table, formats):
+            ws.append(row)
+        if level != ALL_LEVELS:
+            table, formats = gender_table(genders, level, dataset.school_order)
+            for row in _table_rows(ws, f"Attendance Rate by Gender — {week}", table, formats):
+                ws.append(row)
+    wb.save(path)
+    return week
+
+
+def report_terms(dataset):
+    """Every (year, term) with enrolment on record, oldest first."""
+    options = dataset.options
+    return [(year, term) for year in options.enrol_years for term in options.enrol_terms_by_year.get(year, [])]
+
+
+def build_reports(out_dir, data_path=DATA_PATH, all_terms=False, week=None):
+    """Write one workbook per term (the latest only unless ``all_terms``) to ``out_dir``; returns their paths."""
+    dataset = load_dataset(data_path)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    terms = report_terms(dataset)
+    paths = []
+    for year, term in terms if all_terms else terms[-1:]:
+        path = out_dir / f"FCA Donor Report {year} Term {term}.xlsx"
+        write_report(dataset, year, term, path, week)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the quarterly donor report workbooks.")
+    parser.add_argument("--out", type=Path, default=Path("reports"), help="output directory")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="enrolment/attendance workbook")
+    parser.add_argument("--all-terms", action="store_true", help="one workbook for every term on record")
+    parser.add_argument("--week", help="attendance week to report, e.g. 'Week 12' (default: each term's latest)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = build_reports(args.out, args.data, args.all_terms, args.week)
+    print(f"Wrote {len(paths)} report(s) to {args.out} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Concurrent-session load test for the Streamlit dashboards.
+
+    python load_test.py --sessions 1 2 4 8 --rounds 3
+
+For each N, starts one ``streamlit run attendance_2.py`` server and drives N
+sessions against it at once over Streamlit's own websocket protocol, the way
+N browser tabs would (no browser needed). The sessions share the server's
+dataset and view caches, its warm-up thread and its CPU, as real visitors do.
+
+Each session walks the sidebar the way staff do: enrolment year → term →
+level, then attendance year → term → level → week, then the trend weeks,
+then a couple of other weeks. Every rerun is timed from sending the widget
+change to the server's "script finished"; the report gives p50/p95 rerun
+latency over all sessions and the server process's RSS after the run and its
+peak RSS for each N (read from /proc, so Linux only; nan elsewhere).
+
+Each N gets a fresh server, so every row starts from a cold cache and its
+peak RSS is that N's own. Usage counts and snapshots go to a scratch
+directory. If any session fails, its N is reported as invalid (no latencies)
+and the script exits non-zero.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+SIDEBAR = 1  # delta_path root of st.sidebar; 0 is the main area
+
+
+class Session:
+    """One browser tab: a websocket to the server and the sidebar widgets of its last run."""
+
+    def __init__(self, websocket, timeout):
+        self.websocket = websocket
+        self.timeout = timeout
+        self.widgets = {}  # label -> Selectbox/MultiSelect proto from the last run
+        self.choices = {}  # label -> value picked, sent on every later rerun
+        self.latencies = []
+
+    def _widget_states(self):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        states = []
+        for label, value in self.choices.items():
+            widget = self.widgets.get(label)
+            if widget is None:
+                continue  # not drawn this run; the browser would not send it either
+            state = WidgetState(id=widget.id)
+            if isinstance(value, list):
+                state.string_array_value.data.extend(value)
+            else:
+                state.string_value = value
+            states.append(state)
+        return states
+
+    async def rerun(self):
+        """Send the current widget values, read the run's messages and time it."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.widget_states.widgets.extend(self._widget_states())
+        start = time.perf_counter()
+        await self.websocket.send(msg.SerializeToString())
+        widgets, error = {}, None
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.websocket.recv(), self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    error = error or f"{element.exception.type}: {element.exception.message}"
+                elif element_type in ("selectbox", "multiselect") and forward.metadata.delta_path[0] == SIDEBAR:
+                    widget = getattr(element, element_type)
+                    widgets[widget.label] = widget
+            elif kind == "script_finished":
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    widgets = {}
+                    continue  # the app asked for a rerun; this interaction lasts until it ends
+                break
+        self.latencies.append(time.perf_counter() - start)
+        self.widgets = widgets
+        if error:
+            raise RuntimeError(error)
+        if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+            raise RuntimeError("the script failed to compile")
+
+    def _widget(self, label):
+        try:
+            return self.widgets[label]
+        except KeyError:
+            raise LookupError(f"no sidebar widget labelled '{label}'") from None
+
+    async def pick(self, label, rng, position=None):
+        """Choose an option in a sidebar selectbox and rerun.
+
+        The "Select ..." placeholder is skipped; ``position`` indexes the
+        remaining options (years and terms are listed oldest first, weeks
+        newest first) and ``None`` picks one at random.
+        """
+        choices = [option for option in self._widget(label).options if not option.startswith("Select")]
+        if not choices:
+            return
+        self.choices[label] = rng.choice(choices) if position is None else choices[position]
+        await self.rerun()
+
+    async def set_value(self, label, values):
+        self.choices[label] = list(values)
+        await self.rerun()
+
+
+async def simulate_session(url, seed, rounds, timeout):
+    """Run one scripted session against the server at ``url``; returns its rerun latencies in seconds."""
+    import websockets
+
+    rng = random.Random(seed)
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as websocket:
+        session = Session(websocket, timeout)
+        await session.rerun()
+
+        # Enrolment filters
+        await session.pick("Year (Enrolment)", rng, position=-1)
+        await session.pick("Term (Enrolment)", rng, position=-1)
+        await session.pick("Education Level", rng)
+
+        # Attendance filters
+        await session.pick("Select Year", rng, position=-1)
+        await session.pick("Select Term", rng, position=-1)
+        await session.pick("Education Level (Attendance Table)", rng)
+        await session.pick("Select Week", rng, position=0)
+
+        for _ in range(rounds):
+            options = list(session._widget("Compare Trend Weeks").options)
+            await session.set_value("Compare Trend Weeks", rng.sample(options, k=min(len(options), rng.randint(1, 3))))
+            await session.pick("Select Week", rng)
+    return session.latencies
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def _rss_mb(pid):
+    """(current, peak) resident set size of ``pid`` in MB, or NaNs where /proc is missing."""
+    sizes = {}
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                sizes[key] = int(value.split()[0]) / 1024  # kB
+    except OSError:
+        pass
+    return sizes.get("VmRSS", float("nan")), sizes.get("VmHWM", float("nan"))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, scratch, timeout):
+    """Start ``streamlit run app`` on a free port; returns (process, websocket URL) once it answers."""
+    port = _free_port()
+    env = dict(os.environ, FCA_USAGE_STATS=str(Path(scratch) / "usage_stats.json"),
+               FCA_SNAPSHOT_DIR=str(Path(scratch) / "snapshots"))
+    # A file rather than a pipe: nobody reads the log while the test runs, and a full pipe stalls the server
+    log_path = Path(scratch) / "server.log"
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", str(app), "--server.headless", "true",
+             "--server.port", str(port), "--server.address", "127.0.0.1", "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false"],
+            stdout=log, stderr=subprocess.STDOUT, cwd=APP_DIR, env=env,
+        )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited: {log_path.read_text().strip()[-500:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return proc, f"ws://127.0.0.1:{port}/_stcore/stream"
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"server did not answer within {timeout:.0f} s")
+
+
+def run_level(app, sessions, rounds, timeout):
+    """Run ``sessions`` sessions at once against one fresh server and summarise them."""
+    with tempfile.TemporaryDirectory(prefix="fca-load-test-") as scratch:
+        proc, url = start_server(app, scratch, timeout)
+        try:
+            start = time.perf_counter()
+
+            async def run_all():
+                return await asyncio.gather(
+                    *(simulate_session(url, seed, rounds, timeout) for seed in range(sessions)),
+                    return_exceptions=True,
+                )
+
+            results = asyncio.run(run_all())
+            elapsed = time.perf_counter() - start
+            rss_mb, peak_rss_mb = _rss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    errors, latencies = [], []
+    for seed, result in enumerate(results):
+        if isinstance(result, BaseException):
+            errors.append(f"session {seed}: {type(result).__name__}: {result}")
+        else:
+            latencies.extend(result)
+
+    # Latencies from the surviving sessions alone say nothing about N sessions
+    valid = not errors
+    nan = float("nan")
+    return {
+        "sessions": sessions,
+        "valid": valid,
+        "reruns": len(latencies),
+        "p50_ms": _percentile(latencies, 50) * 1000 if valid else nan,
+        "p95_ms": _percentile(latencies, 95) * 1000 if valid else nan,
+        "max_ms": max(latencies, default=nan) * 1000 if valid else nan,
+        "wall_s": elapsed,
+        "rss_mb": rss_mb,
+        "peak_rss_mb": peak_rss_mb,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a Streamlit dashboard with simulated concurrent sessions.")
+    parser.add_argument("--app", type=Path, default=APP_DIR / "attendance_2.py")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="session counts to try")
+    parser.add_argument("--rounds", type=int, default=2, help="extra trend/week interaction rounds per session")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun and server start timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'sessions':>8} {'reruns':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'wall s':>8} "
+              f"{'RSS MB':>8} {'peak RSS MB':>12}")
+    failed = False
+    for sessions in args.sessions:
+        result = run_level(args.app.resolve(), sessions, args.rounds, args.timeout)
+        if args.json:
+            print(json.dumps(result))
+        elif result["valid"]:
+            print(f"{result['sessions']:>8} {result['reruns']:>7} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                  f"{result['max_ms']:>9.1f} {result['wall_s']:>8.1f} {result['rss_mb']:>8.1f} "
+                  f"{result['peak_rss_mb']:>12.1f}")
+        else:
+            print(f"{result['sessions']:>8}   INVALID: {len(result['errors'])} of {sessions} sessions failed")
+        for error in result["errors"]:
+            print(f"  ! {error}", file=sys.stderr)
+        failed = failed or not result["valid"]
+    if failed:
+        raise SystemExit("load test failed: some sessions errored, their rows are invalid")
+
+
+if __name__ == "__main__":
+    main()
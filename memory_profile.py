@@ -0,0 +1,106 @@
+"""Opt-in memory accounting for a dashboard rerun.
+
+Turn it on with ``FCA_MEMORY_PROFILE=1`` or by opening the dashboard with
+``?memory=1``. The app calls ``checkpoint(name)`` after each stage; each call
+closes the previous stage and records the bytes it left allocated and its peak
+Python/NumPy allocation (from ``tracemalloc``). ``report()`` adds the rerun
+totals and the process peak RSS.
+
+tracemalloc is process-wide and slows everything down while it runs, so this is
+a diagnostic for one user at a time, not something to leave on in production.
+"""
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+_STATUS = Path("/proc/self/status")
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def _reset_peak_rss():
+    """Reset the kernel's high-water mark so the next reading covers only this rerun (Linux only)."""
+    try:
+        _CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rss_bytes():
+    """(current RSS, peak RSS) in bytes."""
+    try:
+        fields = dict(line.split(":", 1) for line in _STATUS.read_text().splitlines() if ":" in line)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == "darwin" else peak * 1024
+        return None, peak
+
+
+class MemoryProfile:
+    """Per-stage allocation report for one rerun; every method is a no-op when disabled."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.stages = []
+        self.rss_reset = False
+        self._last = 0
+        self._start = 0
+        self._peak = 0
+        self._clock = 0.0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.rss_reset = _reset_peak_rss()
+        self._start = self._last = tracemalloc.get_traced_memory()[0]
+        self._peak = self._start
+        tracemalloc.reset_peak()
+        self._clock = time.perf_counter()
+
+    def checkpoint(self, name):
+        """Close the stage that just ran under ``name``."""
+        if not self.enabled or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        now = time.perf_counter()
+        self.stages.append({
+            "Stage": name,
+            "Allocated (MB)": (current - self._last) / 1e6,
+            "Stage peak (MB)": (peak - self._last) / 1e6,
+            "Time (ms)": (now - self._clock) * 1000,
+        })
+        self._peak = max(self._peak, peak)
+        self._last = current
+        self._clock = now
+        tracemalloc.reset_peak()
+
+    def report(self):
+        """Stages plus a rerun total row; stops tracing so other sessions run at full speed."""
+        if not self.enabled:
+            return pd.DataFrame()
+        current = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else self._last
+        tracemalloc.stop()
+        rows = list(self.stages)
+        rows.append({
+            "Stage": "Rerun total",
+            "Allocated (MB)": (current - self._start) / 1e6,
+            "Stage peak (MB)": (self._peak - self._start) / 1e6,
+            "Time (ms)": sum(row["Time (ms)"] for row in self.stages),
+        })
+        return pd.DataFrame(rows)
+
+    def rss_summary(self):
+        """One-line RSS summary; the peak covers this rerun only when the kernel allowed a reset."""
+        current, peak = _rss_bytes()
+        scope = "this rerun" if self.rss_reset else "process lifetime"
+        text = f"Peak RSS ({scope}): {peak / 1e6:,.1f} MB"
+        if current is not None:
+            text += f" · current RSS: {current / 1e6:,.1f} MB"
+        return text
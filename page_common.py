@@ -0,0 +1,27 @@
+"""Streamlit blocks shared by the dashboard and its pages.
+
+Kept out of data_pipeline.py, which the command-line tools import without Streamlit.
+"""
+import streamlit as st
+
+from data_pipeline import PROGRAMMES, load_dataset
+
+
+def select_dataset():
+    """Programme selector (shown when there is more than one) and its loaded data: ``(data path, dataset)``.
+
+    Stops the page with an error when the programme's data file is missing.
+    """
+    programmes = list(PROGRAMMES)
+    # Kept in session state rather than the widget so the choice follows the user across pages
+    selected_programme = st.session_state.get("programme")
+    if selected_programme not in PROGRAMMES:
+        selected_programme = programmes[0]
+    if len(programmes) > 1:
+        selected_programme = st.sidebar.selectbox("Programme", programmes, index=programmes.index(selected_programme))
+        st.session_state["programme"] = selected_programme
+    data_path = PROGRAMMES[selected_programme]
+    if not data_path.exists():
+        st.error(f"⚠️ File not found: '{data_path}' — make sure the file is in the app directory.")
+        st.stop()
+    return data_path, load_dataset(data_path)
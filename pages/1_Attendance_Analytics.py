@@ -0,0 +1,69 @@
+import streamlit as st
+
+from analytics import ROLLING_WEEKS
+from data_pipeline import ALL_LEVELS
+from page_common import select_dataset
+from view_cache import analytics_view
+from views import rolling_rate_chart
+
+# ---- Page Config ----
+st.set_page_config(page_title="Attendance Analytics", layout="wide")
+st.title("📈 Attendance Analytics")
+st.info(f"""
+Rolling {ROLLING_WEEKS}-week attendance rates, cumulative term attendance and term-over-term and
+year-over-year changes for every school and grade. Windows restart at the beginning of each term.
+""")
+
+# ---- Load File ----
+_, dataset = select_dataset()
+weekly, terms = analytics_view(dataset)
+options = dataset.options
+rolling_col = f"Rolling {ROLLING_WEEKS}-Week Rate (%)"
+
+# ---- Filters ----
+st.sidebar.header("📋 Filter Analytics")
+selected_level = st.sidebar.selectbox("Education Level", [ALL_LEVELS] + list(dataset.school_order))
+selected_year = st.sidebar.selectbox("Year", options.years[::-1])
+selected_term = st.sidebar.selectbox("Term", options.terms_by_year.get(selected_year, [])[::-1])
+
+if selected_level != ALL_LEVELS:
+    weekly = weekly[weekly["Education_Level"] == selected_level]
+    terms = terms[terms["Education_Level"] == selected_level]
+
+# ---- Term Summary ----
+st.subheader(f"🧾 Term {selected_term}, {selected_year} — Rates and Changes by School and Grade")
+term_table = terms[(terms["Year"] == selected_year) & (terms["Term"] == selected_term)].drop(columns=["Year", "Term"])
+if term_table.empty:
+    st.warning("No attendance recorded for this term.")
+else:
+    st.dataframe(
+        term_table,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Attendance": st.column_config.NumberColumn(format="%.0f"),
+            "Term Rate (%)": st.column_config.NumberColumn(format="%.1f"),
+            "Term-over-Term Δ (pts)": st.column_config.NumberColumn(format="%+.1f"),
+            "Year-over-Year Δ (pts)": st.column_config.NumberColumn(format="%+.1f"),
+        },
+    )
+
+# ---- Rolling Rates ----
+st.subheader(f"📊 Rolling {ROLLING_WEEKS}-Week Attendance Rate")
+schools = sorted(weekly["School_Name"].unique())
+if schools:
+    selected_school = st.selectbox("📍 School", schools)
+    school_weeks = weekly[weekly["School_Name"] == selected_school]
+    st.plotly_chart(rolling_rate_chart(school_weeks, rolling_col), use_container_width=True)
+
+    with st.expander("Weekly figures"):
+        st.dataframe(
+            school_weeks.drop(columns=["Education_Level", "School_Name"]),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Rate (%)": st.column_config.NumberColumn(format="%.1f"),
+                rolling_col: st.column_config.NumberColumn(format="%.1f"),
+                "Cumulative Term Attendance": st.column_config.NumberColumn(format="%.0f"),
+            },
+        )
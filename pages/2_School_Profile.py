@@ -0,0 +1,75 @@
+import streamlit as st
+
+from data_pipeline import ALL_LEVELS
+from page_common import select_dataset
+from view_cache import school_charts
+
+# ---- Page Config ----
+st.set_page_config(page_title="School Profile", layout="wide")
+st.title("🏫 School Profile")
+st.info("""
+One school's enrolment and attendance by grade for a term, its enrolment per term and its weekly attendance rates
+for boys and girls over the whole history.
+""")
+
+# ---- Load File ----
+_, dataset = select_dataset()
+
+# ---- Filters ----
+st.sidebar.header("🏫 Choose a School")
+schools = dataset.schools.names(dataset.school_order)
+if not schools:
+    st.warning("No enrolment recorded.")
+    st.stop()
+# The school picked on the main dashboard opens here
+selected_school = st.session_state.get("school")
+if selected_school not in schools:
+    selected_school = schools[0]
+selected_school = st.sidebar.selectbox("School", schools, index=schools.index(selected_school))
+st.session_state["school"] = selected_school
+
+# Only this school's partition is read from here on
+grades, weeks, terms = dataset.schools.school(selected_school)
+periods = list(terms[["Year", "Term"]].itertuples(index=False, name=None))[::-1]
+selected_year, selected_term = st.sidebar.selectbox("Term", periods, format_func=lambda p: f"Term {p[1]}, {p[0]}")
+school_levels = list(dict.fromkeys(grades["Education_Level"]))
+selected_level = st.sidebar.selectbox("Education Level", [ALL_LEVELS] + school_levels)
+
+# ---- Term Summary ----
+st.subheader(f"{selected_school} — Term {selected_term}, {selected_year}")
+term_grades = grades[(grades["Year"] == selected_year) & (grades["Term"] == selected_term)]
+if selected_level != ALL_LEVELS:
+    term_grades = term_grades[term_grades["Education_Level"] == selected_level]
+
+boys, girls, total = (int(term_grades[col].sum()) for col in ["Boys", "Girls", "Total"])
+attending = term_grades["Average Attendance"].sum()
+recorded = term_grades.loc[term_grades["Average Attendance"].notna(), "Total"].sum()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("👦 Boys", f"{boys:,}")
+col2.metric("👧 Girls", f"{girls:,}")
+col3.metric("👥 Total", f"{total:,}")
+col4.metric("📊 Attendance Rate", f"{attending / recorded * 100:.1f}%" if recorded else "—")
+
+st.markdown("### 📚 Enrolment and Attendance by Grade")
+st.caption("Attendance is the average over the weeks recorded this term.")
+st.dataframe(
+    term_grades.drop(columns=["Year", "Term"]),
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "Education_Level": "Level",
+        "Grade_Level": "Grade",
+        "Average Attendance": st.column_config.NumberColumn(format="%.0f"),
+        "Attendance Rate (%)": st.column_config.NumberColumn(format="%.1f"),
+    },
+)
+
+# ---- History ----
+st.markdown("### 🕰️ History — All Levels")
+enrolment_chart, rate_chart = school_charts(dataset, selected_school)
+if enrolment_chart is not None:
+    st.plotly_chart(enrolment_chart, use_container_width=True)
+if rate_chart is None:
+    st.warning("No attendance recorded for this school.")
+else:
+    st.plotly_chart(rate_chart, use_container_width=True)
@@ -0,0 +1,152 @@
+"""Next-term enrolment and attendance projections for every school and grade.
+
+Each (level, school, grade) enrolment series over the terms on record is fitted
+with the same trend model, all at once: the per-series normal equations are
+stacked into one (series, p, p) array and solved with a single batched
+pseudo-inverse, so fitting thousands of series is a handful of NumPy calls.
+
+The model grows with the history available: a flat level with one term on
+record, a linear trend over terms with fewer than two full years, and a
+linear trend plus a per-term seasonal offset after that. Intervals are 95%
+prediction intervals from each series' own residuals; expected attendance
+applies each series' attendance rate in the latest term with attendance.
+"""
+import numpy as np
+
+from data_pipeline import ALL_LEVELS, SCHOOL_ORDER, ordered_schools
+
+SERIES_KEYS = ["Education_Level", "School_Name", "Grade_Level"]
+TERMS_PER_YEAR = 3
+# Two-sided 95% Student t quantiles by residual degrees of freedom; 1.96 beyond 30
+_T95 = [12.71, 4.30, 3.18, 2.78, 2.57, 2.45, 2.36, 2.31, 2.26, 2.23, 2.20, 2.18, 2.16, 2.14, 2.13,
+        2.12, 2.11, 2.10, 2.09, 2.09, 2.08, 2.07, 2.07, 2.06, 2.06, 2.06, 2.05, 2.05, 2.05, 2.04]
+PROJECTION_COLS = ["Enrolment", "Enrolment Low", "Enrolment High",
+                   "Expected Attendance", "Attendance Low", "Attendance High"]
+
+
+def _t95(dof):
+    dof = np.asarray(dof)
+    table = np.append(_T95, 1.96)
+    return np.where(dof >= 1, table[np.clip(dof, 1, len(table)) - 1], np.nan)
+
+
+def term_index(year, term):
+    """Consecutive integer for a (year, term) so trends are fitted in term steps."""
+    return np.asarray(year) * TERMS_PER_YEAR + np.asarray(term) - 1
+
+
+def next_term(year, term):
+    return (year, term + 1) if term < TERMS_PER_YEAR else (year + 1, 1)
+
+
+def design_matrix(periods, terms, seasonal):
+    """Rows of [1, t] plus one dummy per term after the first when ``seasonal``."""
+    t = np.asarray(periods, dtype=float)
+    columns = [np.ones_like(t), t - t.min() if len(t) else t]
+    if seasonal:
+        columns += [(np.asarray(terms) == k).astype(float) for k in range(2, TERMS_PER_YEAR + 1)]
+    return np.column_stack(columns)
+
+
+def fit_batched(design, values, observed):
+    """Least squares for every series against one shared design matrix.
+
+    ``values`` and ``observed`` are (series, periods); unobserved periods get
+    zero weight. Returns the coefficients (series, p), the unscaled
+    covariances (series, p, p), the residual variances and the residual
+    degrees of freedom.
+    """
+    weights = observed.astype(float)
+    xtx = np.einsum("tp,st,tq->spq", design, weights, design, optimize=True)
+    xty = np.einsum("tp,st->sp", design, weights * np.nan_to_num(values))
+    xtx_inv = np.linalg.pinv(xtx)
+    beta = np.einsum("spq,sq->sp", xtx_inv, xty)
+
+    residuals = np.where(observed, np.nan_to_num(values) - beta @ design.T, 0)
+    dof = observed.sum(axis=1) - np.linalg.matrix_rank(xtx)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma2 = np.where(dof > 0, (residuals ** 2).sum(axis=1) / dof, np.nan)
+    return beta, xtx_inv, sigma2, dof
+
+
+def enrolment_series(dataset):
+    """(series index, (year, term) columns, series × term enrolment with NaN where not recorded)."""
+    totals = dataset.enrolment.frame.groupby(level=SERIES_KEYS + ["Year", "Term"])["Total"].sum(min_count=1)
+    wide = totals.unstack(["Year", "Term"]).sort_index(axis=1)
+    return wide.index, wide.columns, wide.to_numpy(dtype=float)
+
+
+def latest_attendance_rates(dataset, series):
+    """Each series' attendance rate (fraction) over the latest term with attendance on record."""
+    year = dataset.options.years[-1]
+    # One term is a prefix slice of the sorted fact table
+    rows = dataset.term_rows(year, dataset.options.terms_by_year[year][-1])
+    totals = rows.groupby(SERIES_KEYS)[["Total_Attendance", "Total_Enrolment"]].sum()
+    enrolment = totals["Total_Enrolment"]
+    rate = totals["Total_Attendance"] / enrolment.where(enrolment > 0)
+    return rate.reindex(series).to_numpy()
+
+
+def project_next_term(dataset):
+    """Projected enrolment and expected attendance for the term after the latest one on record."""
+    series, columns, values = enrolment_series(dataset)
+    years = columns.get_level_values("Year").to_numpy()
+    terms = columns.get_level_values("Term").to_numpy()
+    periods = term_index(years, terms)
+    target_year, target_term = next_term(int(years[-1]), int(terms[-1]))
+
+    observed = ~np.isnan(values)
+    full_years = len(np.unique(years)) >= 2 and len(periods) >= 2 * TERMS_PER_YEAR
+    design = design_matrix(periods, terms, seasonal=full_years)
+    if len(periods) < 2:
+        design = design[:, :1]  # one term on record: carry the level forward
+    beta, xtx_inv, sigma2, dof = fit_batched(design, values, observed)
+
+    target = design_matrix(np.append(periods, term_index(target_year, target_term)),
+                           np.append(terms, target_term), seasonal=full_years)[-1, :design.shape[1]]
+    prediction = np.clip(beta @ target, 0, None)
+    variance = sigma2 * (1 + np.einsum("p,spq,q->s", target, xtx_inv, target))
+    half_width = _t95(dof) * np.sqrt(variance)
+
+    rate = latest_attendance_rates(dataset, series)
+    frame = series.to_frame(index=False)
+    frame["Year"], frame["Term"] = target_year, target_term
+    frame["Enrolment"] = prediction
+    frame["Enrolment Low"] = np.clip(prediction - half_width, 0, None)
+    frame["Enrolment High"] = prediction + half_width
+    frame["Variance"] = variance
+    frame["Attendance Rate"] = rate
+    frame["Expected Attendance"] = prediction * rate
+    frame["Attendance Low"] = frame["Enrolment Low"] * rate
+    frame["Attendance High"] = frame["Enrolment High"] * rate
+    # Grades missing from the latest term have closed; do not project them
+    return frame[observed[:, -1]].reset_index(drop=True)
+
+
+def summarize_projection(projection, level, grade=None, school_order=SCHOOL_ORDER):
+    """Per-school projection for a level (and grade), in display order, with a TOTAL row.
+
+    Series are summed per school; interval half-widths combine as the square
+    root of the summed variances, treating the grades as independent.
+    """
+    rows = projection
+    if level != ALL_LEVELS:
+        rows = rows[rows["Education_Level"] == level]
+        if grade is not None:
+            rows = rows[rows["Grade_Level"] == grade]
+
+    # A series without an interval leaves its school's interval unknown rather than too narrow
+    rows = rows.assign(Variance=rows["Variance"].fillna(np.inf))
+    sums = ["Enrolment", "Expected Attendance", "Variance"]
+    schools = ordered_schools(level, school_order)
+    summary = rows.groupby("School_Name")[sums].sum(min_count=1).reindex(schools).dropna(how="all")
+    summary.loc["TOTAL"] = rows[sums].sum(min_count=1)
+
+    summary["Attendance Rate"] = summary["Expected Attendance"] / summary["Enrolment"]
+    summary["Std Error"] = np.sqrt(summary["Variance"].replace(np.inf, np.nan))
+    half_width = 1.96 * summary["Std Error"]
+    summary["Enrolment Low"] = (summary["Enrolment"] - half_width).clip(lower=0)
+    summary["Enrolment High"] = summary["Enrolment"] + half_width
+    summary["Attendance Low"] = summary["Enrolment Low"] * summary["Attendance Rate"]
+    summary["Attendance High"] = summary["Enrolment High"] * summary["Attendance Rate"]
+    return summary.rename_axis("School_Name").reset_index()[["School_Name"] + PROJECTION_COLS]
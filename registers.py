@@ -0,0 +1,102 @@
+"""Ingestion of learner-level daily attendance registers.
+
+A register export is a CSV (or a directory of them) with one row per learner
+per school day:
+
+    Learner_ID, Date, Year, Term, School_Name, Education_Level, Grade_Level, Gender, Present
+
+``read_registers`` streams the files in chunks of ``REGISTER_CHUNK_ROWS`` and
+never holds a whole register in memory. Each chunk is reduced on the spot to
+two small tables: learners present per school × grade × gender × day, and the
+distinct learners on each term's roll. Learner IDs are kept as 64-bit hashes
+and dates as datetime64, with the text keys as categoricals, so the roster is a
+few numeric arrays rather than a column of Python strings.
+
+The result is the same pair of frames ``read_workbook`` returns: enrolment is
+the number of distinct learners on the register per school/grade/term, and a
+week's attendance is the average number present per school day of that week.
+Weeks are counted from the Monday of the first register day of each term.
+"""
+import pandas as pd
+
+from data_pipeline import COMMON_COLS, COUNT_COLS, source_files
+
+REGISTER_COLS = ["Learner_ID", "Date", "Year", "Term", "School_Name", "Education_Level",
+                 "Grade_Level", "Gender", "Present"]
+REGISTER_CHUNK_ROWS = 500_000
+GROUP_COLS = COMMON_COLS + ["Gender"]
+# Register spellings of each gender -> the Boys/Girls columns of the aggregated sheets
+GENDER_CODES = {"m": "Boys", "male": "Boys", "boy": "Boys", "boys": "Boys",
+                "f": "Girls", "female": "Girls", "girl": "Girls", "girls": "Girls"}
+PRESENT_CODES = {"1", "1.0", "p", "present", "y", "yes", "true"}
+_DTYPES = {"Learner_ID": str, "Date": "category", "Year": "int16", "Term": "int8", "School_Name": "category",
+           "Education_Level": "category", "Grade_Level": "category", "Gender": "category", "Present": "category"}
+
+
+def _compact(chunk):
+    """Typed copy of one chunk: hashed learner IDs, datetime64 dates, boolean presence, gender as Boys/Girls."""
+    chunk["Learner_ID"] = pd.util.hash_array(chunk["Learner_ID"].to_numpy(dtype=object))
+    # Dates, marks and genders repeat on every row: each distinct value is parsed once, per category
+    dates = chunk["Date"].cat.categories
+    chunk["Date"] = chunk["Date"].cat.rename_categories(pd.to_datetime(dates, format="ISO8601")).astype("datetime64[s]")
+    present = {mark: str(mark).strip().lower() in PRESENT_CODES for mark in chunk["Present"].cat.categories}
+    chunk["Present"] = chunk["Present"].map(present).astype(bool)
+    # Spellings outside GENDER_CODES become NaN and drop out
+    labels = {gender: GENDER_CODES.get(str(gender).strip().lower()) for gender in chunk["Gender"].cat.categories}
+    chunk["Gender"] = chunk["Gender"].map(labels).astype("category")
+    return chunk
+
+
+def _daily_counts(chunk):
+    """Learners present per school/grade/gender and day."""
+    return chunk.groupby(GROUP_COLS + ["Date"], observed=True)["Present"].sum().astype("int64")
+
+
+def _add_to_roster(roster, chunk):
+    """``roster`` plus the chunk's distinct (term, school, grade, gender, learner) rows, keys kept categorical."""
+    roster = pd.concat([roster, chunk[GROUP_COLS + ["Learner_ID"]]], ignore_index=True).drop_duplicates(ignore_index=True)
+    for col in ["School_Name", "Education_Level", "Grade_Level", "Gender"]:
+        roster[col] = roster[col].astype("category")
+    return roster
+
+
+def _by_gender(counts):
+    """Long counts with a Gender level -> Boys/Girls/Total columns, COUNT_COLS last."""
+    wide = counts.unstack("Gender", fill_value=0).reindex(columns=["Boys", "Girls"], fill_value=0)
+    wide["Total"] = wide["Boys"] + wide["Girls"]
+    return wide[COUNT_COLS].astype(float).rename_axis(columns=None).reset_index()
+
+
+def read_registers(path, chunk_rows=REGISTER_CHUNK_ROWS):
+    """(enrolment frame, attendance frame) aggregated from the register CSVs at ``path``.
+
+    Both frames have the columns of the workbook sheets, so they drop straight
+    into ``Dataset``. Peak memory is one chunk plus the daily counts and the
+    term rosters, whatever the number of register rows.
+    """
+    daily, roster = [], None
+    for file in source_files(path):
+        for chunk in pd.read_csv(file, usecols=REGISTER_COLS, dtype=_DTYPES,
+                                 skipinitialspace=True, chunksize=chunk_rows):
+            chunk = _compact(chunk.dropna(subset=["Learner_ID", "Date"]))
+            daily.append(_daily_counts(chunk))
+            roster = _add_to_roster(roster, chunk)
+
+    # A day split across two chunks is summed back together here, on the reduced counts
+    present = pd.concat(daily).groupby(level=GROUP_COLS + ["Date"], observed=True).sum().reset_index()
+
+    term_start = present.groupby(["Year", "Term"])["Date"].transform("min").dt.to_period("W-SUN").dt.start_time
+    present["Attendance_Week"] = "Week " + ((present["Date"] - term_start).dt.days // 7 + 1).astype(str)
+    # Unrounded, like the workbook's weekly averages, so both routes give the same rates
+    weekly = present.groupby(GROUP_COLS + ["Attendance_Week"], observed=True)["Present"].mean()
+    attend_df = _by_gender(weekly)
+
+    enrolled = roster.groupby(GROUP_COLS, observed=True).size()
+    enrol_df = _by_gender(enrolled)
+
+    # Same dtypes as the workbook sheets
+    for df in [enrol_df, attend_df]:
+        df[["Year", "Term"]] = df[["Year", "Term"]].astype(int)
+        for col in ["School_Name", "Education_Level", "Grade_Level"]:
+            df[col] = df[col].astype(str)
+    return enrol_df, attend_df
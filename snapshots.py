@@ -0,0 +1,264 @@
+"""Immutable, content-addressed snapshots of the typed enrolment and attendance tables.
+
+Every new version of a programme's data that ``load_dataset`` reads is saved
+here. Each table is split into one partition per year/term, stored as Parquet
+under the hash of its contents, so a term that did not change between two
+ingests is stored once and shared by both snapshots. A snapshot is a small
+JSON manifest naming its source and partitions; its id is the hash of those,
+so re-saving an unchanged workbook gives the same snapshot.
+
+    python snapshots.py list
+    python snapshots.py diff 3f2a9c1e0b7d4a55 8e41d07c2b9f6a13 --out changes.csv
+
+``diff_snapshots`` compares two snapshots cell by cell: partitions with the
+same hash are skipped, the rest are outer-joined on their keys and compared
+column by column.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import APP_DIR, COMMON_COLS, COUNT_COLS, DATA_PATH, DATASETS, Dataset, school_order_for
+
+SNAPSHOT_DIR = Path(os.environ.get("FCA_SNAPSHOT_DIR", APP_DIR / "snapshots"))
+# Keys that identify one row of each sheet; the counts are compared under them
+TABLE_KEYS = {
+    "enrolment": COMMON_COLS,
+    "attendance": COMMON_COLS + ["Attendance_Week"],
+}
+DIFF_COLS = ["Table"] + TABLE_KEYS["attendance"] + ["Column", "Old", "New", "Change", "Status"]
+
+
+def _hash(df):
+    """Content hash of a frame: column names, dtypes and every value in row order."""
+    digest = hashlib.sha256(json.dumps([[col, str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:32]
+
+
+def _storable(df):
+    """``df`` with free-text columns that mix strings and numbers (a "Remarks" column) as text.
+
+    Parquet needs one type per column; the dashboard never reads these columns.
+    """
+    mixed = [
+        col for col in df.columns[df.dtypes == object]
+        if df[col].dropna().map(type).nunique() > 1
+    ]
+    if not mixed:
+        return df
+    return df.assign(**{col: df[col].where(df[col].isna(), df[col].astype(str)) for col in mixed})
+
+
+def _partitions(df):
+    """``{"year-term": rows}`` for one table, in year/term order."""
+    return {
+        f"{year}-{term}": rows.reset_index(drop=True)
+        for (year, term), rows in _storable(df).groupby(["Year", "Term"], dropna=False, sort=True)
+    }
+
+
+def _write_atomic(path, data):
+    """Write ``data`` to a temp file of this writer's own, then rename it to ``path``.
+
+    A reader never sees half a file, and concurrent writers (build_static_site's
+    worker processes) never share a temp file.
+    """
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False) as tmp:
+        tmp.write(data)
+    os.replace(tmp.name, path)
+
+
+def _write_object(store, df):
+    """Save ``df`` under its content hash unless it is already there; returns the hash."""
+    name = _hash(df)
+    path = store / "objects" / f"{name}.parquet"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        _write_atomic(path, buffer.getvalue())
+    return name
+
+
+def take_snapshot(enrol_df, attend_df, source=DATA_PATH, store=SNAPSHOT_DIR):
+    """Save both tables as a snapshot of ``source``; returns its id. Idempotent."""
+    store = Path(store)
+    tables = {
+        table: {key: _write_object(store, rows) for key, rows in _partitions(df).items()}
+        for table, df in [("enrolment", enrol_df), ("attendance", attend_df)]
+    }
+    snapshot_id = hashlib.sha256(json.dumps([str(source), tables], sort_keys=True).encode()).hexdigest()[:16]
+
+    path = store / "manifests" / f"{snapshot_id}.json"
+    if not path.exists():
+        # Microseconds, so snapshots taken within the same second still sort in order
+        created = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        manifest = {"id": snapshot_id, "source": str(source), "created": created, "tables": tables}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, json.dumps(manifest, indent=1).encode())
+    return snapshot_id
+
+
+def read_manifest(snapshot_id, store=SNAPSHOT_DIR):
+    path = Path(store) / "manifests" / f"{snapshot_id}.json"
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        raise KeyError(f"No snapshot '{snapshot_id}' in {store}") from None
+
+
+_listings = {}
+_listings_lock = threading.Lock()
+
+
+def _all_snapshots(store):
+    """Every manifest's listing row, re-read only when a manifest is added.
+
+    Keyed on the directory's mtime and file count: a ``stat`` and a
+    ``listdir`` per call instead of parsing every manifest on every rerun.
+    """
+    manifests = Path(store) / "manifests"
+    try:
+        key = (str(manifests), manifests.stat().st_mtime_ns, len(os.listdir(manifests)))
+    except FileNotFoundError:
+        return pd.DataFrame(columns=["id", "source", "created", "terms"])
+    with _listings_lock:
+        listing = _listings.get(key)
+    if listing is None:
+        rows = []
+        for path in manifests.glob("*.json"):
+            manifest = json.loads(path.read_text())
+            rows.append({
+                "id": manifest["id"],
+                "source": manifest["source"],
+                "created": manifest["created"],
+                "terms": len(manifest["tables"]["enrolment"]),
+            })
+        listing = pd.DataFrame(rows, columns=["id", "source", "created", "terms"])
+        # Parsed rather than compared as text: older manifests have whole seconds only; id breaks ties
+        order = pd.to_datetime(listing["created"], format="ISO8601", utc=True)
+        listing = listing.assign(order=order).sort_values(["order", "id"], ignore_index=True).drop(columns="order")
+        with _listings_lock:
+            _listings.clear()
+            _listings[key] = listing
+    return listing
+
+
+def list_snapshots(source=None, store=SNAPSHOT_DIR):
+    """Id, source, creation time and partition count of every snapshot (of ``source`` if given), oldest first."""
+    listing = _all_snapshots(store)
+    if source is not None:
+        listing = listing[listing["source"] == str(source)].reset_index(drop=True)
+    return listing.copy()
+
+
+def _read_object(store, name):
+    return pd.read_parquet(Path(store) / "objects" / f"{name}.parquet")
+
+
+def read_table(snapshot_id, table, store=SNAPSHOT_DIR):
+    """One table of a snapshot, as it was ingested."""
+    names = read_manifest(snapshot_id, store)["tables"][table].values()
+    return pd.concat([_read_object(store, name) for name in names], ignore_index=True)
+
+
+def load_snapshot(snapshot_id, store=SNAPSHOT_DIR):
+    """The Dataset for a past snapshot; kept in the shared dataset cache like a live programme."""
+    key = f"snapshot:{snapshot_id}"
+    dataset = DATASETS.get(key, snapshot_id)
+    if dataset is None:
+        enrol_df = read_table(snapshot_id, "enrolment", store)
+        attend_df = read_table(snapshot_id, "attendance", store)
+        dataset = Dataset(snapshot_id, enrol_df, attend_df, school_order=school_order_for(enrol_df))
+        DATASETS.put(key, dataset)
+    return dataset
+
+
+# ---- Diffs ----
+def _diff_table(table, old, new):
+    """Changed cells between two versions of one table, in DIFF_COLS layout."""
+    keys = TABLE_KEYS[table]
+    # Duplicate keys are summed, as every summary does
+    old = old.groupby(keys, dropna=False)[COUNT_COLS].sum(min_count=1)
+    new = new.groupby(keys, dropna=False)[COUNT_COLS].sum(min_count=1)
+    joined = old.join(new, how="outer", lsuffix="_old", rsuffix="_new")
+    in_old = joined.index.isin(old.index)
+    in_new = joined.index.isin(new.index)
+    status = np.select([~in_old, ~in_new], ["added", "removed"], "changed")
+
+    frames = []
+    for col in COUNT_COLS:
+        before, after = joined[f"{col}_old"], joined[f"{col}_new"]
+        # Float noise from the source sums (332.20000000000005 vs 332.2) is not a change
+        changed = ~np.isclose(before.to_numpy(dtype=float), after.to_numpy(dtype=float),
+                              rtol=1e-9, atol=1e-9, equal_nan=True)
+        frames.append(pd.DataFrame({
+            "Column": col,
+            "Old": before[changed],
+            "New": after[changed],
+            "Change": (after - before)[changed],
+            "Status": status[changed],
+        }))
+    cells = pd.concat(frames).sort_index(kind="stable").reset_index()
+    cells.insert(0, "Table", table)
+    return cells.reindex(columns=DIFF_COLS)
+
+
+def diff_snapshots(old_id, new_id, store=SNAPSHOT_DIR):
+    """Every cell that differs between two snapshots, with the old and new values.
+
+    Only partitions whose hashes differ are read and compared.
+    """
+    old_tables = read_manifest(old_id, store)["tables"]
+    new_tables = read_manifest(new_id, store)["tables"]
+    diffs = []
+    for table in TABLE_KEYS:
+        old_parts, new_parts = old_tables[table], new_tables[table]
+        changed = sorted(key for key in set(old_parts) | set(new_parts) if old_parts.get(key) != new_parts.get(key))
+        if not changed:
+            continue
+
+        def read(parts):
+            frames = [_read_object(store, parts[key]) for key in changed if key in parts]
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TABLE_KEYS[table] + COUNT_COLS)
+
+        diffs.append(_diff_table(table, read(old_parts), read(new_parts)))
+    if not diffs:
+        return pd.DataFrame(columns=DIFF_COLS)
+    return pd.concat(diffs, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and compare snapshots of the dashboard data.")
+    parser.add_argument("--store", type=Path, default=SNAPSHOT_DIR, help="snapshot directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="every snapshot, oldest first")
+    diff = commands.add_parser("diff", help="changed cells between two snapshots")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--out", type=Path, help="write the changes to this CSV instead of printing them")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print(list_snapshots(store=args.store).to_string(index=False))
+        return
+    changes = diff_snapshots(args.old, args.new, args.store)
+    if args.out:
+        changes.to_csv(args.out, index=False)
+        print(f"{len(changes):,} changed cells written to {args.out}")
+    else:
+        print(changes.to_string(index=False) if len(changes) else "No changes.")
+
+
+if __name__ == "__main__":
+    main()
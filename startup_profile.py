@@ -0,0 +1,131 @@
+"""Cold-start measurements for the dashboard: import times and time to first paint.
+
+    python startup_profile.py
+    python startup_profile.py --runs 5 --top 15
+
+``imports`` runs ``python -X importtime`` over the modules the app imports at
+the top and lists the packages that take longest to import, counting every
+module of a package (``plotly.express``, ``plotly.graph_objects``, ...)
+under its top-level name, whoever imported it first.
+
+``first paint`` starts a fresh interpreter per run, as a new container would,
+and times with Streamlit's in-process ``AppTest`` runner (no browser, no
+server): importing Streamlit, the first script run (title, instructions and
+sidebar filters, which is what a visitor sees first), a rerun, and the first
+chart (the enrolment section for the latest year/term and ALL LEVELS), which
+pays for importing plotly.express. The report is the median of ``--runs`` processes.
+"""
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+
+
+def app_imports(app):
+    """Top-level modules ``app`` imports, in order of first appearance."""
+    modules = []
+    for node in ast.parse(Path(app).read_text()).body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name not in modules]
+    return modules
+
+
+def import_times(modules, top=10):
+    """[(package, ms)] for the slowest packages when importing ``modules`` cold."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {name}" for name in modules)],
+        capture_output=True, text=True, cwd=APP_DIR,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    times = {}
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |     cumulative | imported package"
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        own, _, module = line[len("import time:"):].split("|")
+        package = module.strip().split(".")[0]
+        times[package] = times.get(package, 0) + int(own) / 1000
+    return sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure_first_paint(app, timeout):
+    """Timings in ms for one cold process; see the module docstring."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    timings = {"import_streamlit_ms": (time.perf_counter() - start) * 1000}
+
+    at = AppTest.from_file(str(app), default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    timings["first_paint_ms"] = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    start = time.perf_counter()
+    at.run()
+    timings["rerun_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for label, option in [("Year (Enrolment)", -1), ("Term (Enrolment)", -1), ("Education Level", "ALL LEVELS")]:
+        box = next(box for box in at.sidebar.selectbox if box.label == label)
+        box.select(option if isinstance(option, str) else box.options[option])
+    at.run()
+    timings["first_chart_ms"] = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard import time and time to first paint.")
+    parser.add_argument("--app", type=Path, default=APP_DIR / "attendance_2.py")
+    parser.add_argument("--runs", type=int, default=3, help="cold processes to take the median of")
+    parser.add_argument("--top", type=int, default=10, help="packages to list in the import report")
+    parser.add_argument("--timeout", type=float, default=120, help="per-run timeout in seconds")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        import logging
+        import warnings
+        warnings.filterwarnings("ignore")
+        logging.disable(logging.WARNING)
+        print(json.dumps(measure_first_paint(args.app.resolve(), args.timeout)))
+        return
+
+    modules = app_imports(args.app)
+    print(f"Slowest imports of {args.app.name} (cold):")
+    for package, ms in import_times(modules, args.top):
+        print(f"  {package:<40} {ms:>8.1f} ms")
+
+    runs = []
+    for _ in range(args.runs):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", "--app", str(args.app), "--timeout", str(args.timeout)],
+            capture_output=True, text=True, cwd=APP_DIR,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            raise SystemExit("first-paint run failed")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"First paint, median of {args.runs} cold processes:")
+    for key, label in [("import_streamlit_ms", "Import Streamlit"), ("first_paint_ms", "First paint"),
+                       ("rerun_ms", "Rerun"), ("first_chart_ms", "First chart")]:
+        print(f"  {label:<40} {statistics.median(run[key] for run in runs):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
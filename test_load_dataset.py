@@ -0,0 +1,57 @@
+"""load_dataset and its snapshot side effect.
+
+    python -m pytest -q test_load_dataset.py
+"""
+import os
+import tempfile
+import warnings
+
+# Snapshots go to a scratch store, not the app's own history
+os.environ.setdefault("FCA_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="fca-snapshots-"))
+
+import pandas as pd
+
+from data_pipeline import ATTENDANCE_SHEET, DATA_PATH, ENROLMENT_SHEET, load_dataset
+from snapshots import list_snapshots, read_table
+
+
+def write_workbook(path, remarks):
+    """The shipped workbook with a free-text "Remarks" column added to the enrolment sheet."""
+    xls = pd.ExcelFile(DATA_PATH)
+    enrol_df = xls.parse(ENROLMENT_SHEET)
+    attend_df = xls.parse(ATTENDANCE_SHEET)
+    enrol_df["Remarks"] = [remarks[i % len(remarks)] for i in range(len(enrol_df))]
+    with pd.ExcelWriter(path) as writer:
+        enrol_df.to_excel(writer, sheet_name=ENROLMENT_SHEET, index=False)
+        attend_df.to_excel(writer, sheet_name=ATTENDANCE_SHEET, index=False)
+
+
+def test_mixed_type_column_loads_and_snapshots(tmp_path):
+    path = tmp_path / "remarks.xlsx"
+    write_workbook(path, ["new school", 12, None])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)  # a skipped snapshot warns
+        dataset = load_dataset(path)
+    assert len(dataset.enrolment.frame)
+
+    snapshots = list_snapshots(source=path)
+    assert len(snapshots) == 1
+    enrol_df = read_table(snapshots["id"].iloc[0], "enrolment")
+    assert set(enrol_df["Remarks"].dropna()) == {"new school", "12"}
+
+
+def test_failed_snapshot_does_not_stop_loading(tmp_path, monkeypatch):
+    import snapshots
+
+    def unwritable(*args, **kwargs):
+        raise TypeError("Conversion failed for column Remarks with type object")
+
+    monkeypatch.setattr(snapshots, "take_snapshot", unwritable)
+    path = tmp_path / "remarks.xlsx"
+    write_workbook(path, ["new school", 12])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        dataset = load_dataset(path)
+    assert len(dataset.attendance)
+    assert any("Snapshot of remarks.xlsx skipped" in str(w.message) for w in caught)
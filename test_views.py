@@ -0,0 +1,40 @@
+"""Chart payloads: the compact charts carry fewer traces and fewer bytes.
+
+    python -m pytest -q test_views.py
+"""
+import os
+import tempfile
+
+# Snapshots go to a scratch store, not the app's own history
+os.environ.setdefault("FCA_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="fca-snapshots-"))
+
+import pytest
+
+from data_pipeline import DATA_PATH, load_dataset
+from view_cache import _level_charts, default_selection
+from views import payload_report
+
+
+@pytest.fixture(scope="module")
+def reports():
+    """``payload_report`` of every level's rate chart, standard and compact, indexed by level."""
+    dataset = load_dataset(DATA_PATH)
+    year, term, week = default_selection(dataset)
+    return {
+        compact: payload_report([
+            (level, rate_fig) for level, rate_fig, _ in _level_charts(dataset, year, term, week, compact, pool=False)
+        ]).set_index("Chart").sort_index()
+        for compact in (False, True)
+    }
+
+
+def test_compact_rate_chart_is_one_trace(reports):
+    standard, compact = reports[False], reports[True]
+    assert (compact["Traces"] == 1).all()
+    # One trace per grade in the standard chart; every level here has more than one grade
+    assert (standard["Traces"] > compact["Traces"]).all()
+
+
+def test_compact_rate_chart_is_smaller(reports):
+    standard, compact = reports[False], reports[True]
+    assert (compact["Size (KB)"] < standard["Size (KB)"]).all()
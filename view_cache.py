@@ -0,0 +1,422 @@
+"""Process-wide cache of built dashboard views, and the job that warms it.
+
+A "view" is one block of the dashboard for one filter selection: the
+enrolment table and chart, the attendance table and chart, the per-level
+charts for a week, the weekly trend charts, the trend line, a school's
+history charts and the cohort progression. They are cached per data version
+and shared by every session in the process.
+
+``start_warmer`` runs a background thread that builds the default views (the
+latest year/term/week and the two most recent trend weeks) once the first
+page has been drawn and again whenever the workbook changes, then the filter
+combinations people actually use most on each programme that is loaded, as
+counted by ``UsageStats``. The first click after a deploy or a data refresh then costs
+the same as any other. The warmer only builds while no script run is in
+progress or just finished (``run_started``/``run_finished``), so it does not
+compete with a visitor for the CPU.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from analytics import attendance_analytics, attendance_alerts
+from cohorts import cohort_progression, summarize_cohorts, cohort_grid
+from data_pipeline import (
+    ALL_LEVELS, DATA_PATH, DATASETS, load_dataset, summarize_enrolment, summarize_attendance,
+    level_frame, gender_rates, level_gender_rates, default_trend_weeks, weekly_trends_by_level, weekly_attendance,
+    week_number, attendance_history, downsample_minmax,
+)
+from projections import project_next_term
+from views import (
+    table_page, enrolment_table_html, attendance_table_html, enrolment_gender_chart, attendance_rate_chart,
+    level_rate_chart, level_gender_chart, trend_chart, attendance_line_chart, long_range_chart,
+    school_enrolment_chart, school_rate_chart, cohort_heatmap,
+)
+
+# Points per school sent for the long-range trend, whatever the length of the history
+HISTORY_MAX_POINTS = 200
+USAGE_PATH = Path(os.environ.get("FCA_USAGE_STATS", Path(__file__).resolve().parent / "usage_stats.json"))
+# Worker threads for per-level figure construction. Off by default: the pandas work is one groupby for
+# all levels, what is left is building Plotly figures, which holds the GIL, and ``benchmark.py levels``
+# measured no gain; set FCA_LEVEL_WORKERS=4 to try it on other hardware
+LEVEL_WORKERS = int(os.environ.get("FCA_LEVEL_WORKERS", 1))
+_level_pool = ThreadPoolExecutor(max_workers=LEVEL_WORKERS, thread_name_prefix="fca-level") if LEVEL_WORKERS > 1 else None
+
+
+# ---- View Builders ----
+def _enrolment(dataset, year, term, level, grade):
+    """(summary, first page of the table in display order, chart)."""
+    summary = summarize_enrolment(dataset.enrolment_rows(year, term, level, grade), level, dataset.school_order)
+    return summary, enrolment_table_html(table_page(summary)[0]), enrolment_gender_chart(summary)
+
+
+def _attendance(dataset, year, term, week, level):
+    """(summary, first page of the table in display order, chart)."""
+    summary = summarize_attendance(dataset.week_rows(year, term, week), level, dataset.school_order)
+    return summary, attendance_table_html(table_page(summary)[0]), attendance_rate_chart(summary)
+
+
+def map_levels(build, levels, pool=None):
+    """``build(level)`` for every level, run in the level pool, results in display order.
+
+    The levels share no state (each slices its own rows from a read-only
+    frame), so they can be built concurrently; only the order they are
+    emitted in is fixed. ``pool=False`` builds them one after another.
+    """
+    pool = _level_pool if pool is None else pool
+    if not pool:
+        return [build(level) for level in levels]
+    return list(pool.map(build, levels))
+
+
+def _level_charts(dataset, year, term, week, compact=False, pool=None):
+    """(level, rate chart, gender chart) for every level in one week."""
+    filtered_df = dataset.week_rows(year, term, week)
+    genders = gender_rates(filtered_df, dataset.school_order)
+
+    def build(level):
+        df_level = level_frame(filtered_df, level, dataset.school_order)
+        return (
+            level,
+            level_rate_chart(df_level, level, compact),
+            level_gender_chart(level_gender_rates(genders, level), level, compact),
+        )
+
+    return map_levels(build, dataset.school_order, pool)
+
+
+def _trends(dataset, year, term, weeks, compact=False, pool=None):
+    """(level, trend chart or None when the level has no rows) for every level."""
+    # Every level's trend table from one groupby over the term's rows
+    trends = weekly_trends_by_level(dataset.term_rows(year, term), list(weeks))
+
+    def build(level):
+        trend_df = trends.get(level)
+        return level, None if trend_df is None else trend_chart(trend_df, level, compact)
+
+    return map_levels(build, dataset.school_order, pool)
+
+
+def _trend_line(dataset, year, term, level):
+    return attendance_line_chart(weekly_attendance(dataset.term_rows(year, term), level))
+
+
+def _history(dataset, level, grain):
+    history, grain = attendance_history(dataset, level, grain)
+    return long_range_chart(downsample_minmax(history, HISTORY_MAX_POINTS), grain)
+
+
+def _school(dataset, school):
+    grades, weeks, terms = dataset.schools.school(school)
+    return (
+        school_enrolment_chart(terms) if len(terms) else None,
+        school_rate_chart(weeks) if len(weeks) else None,
+    )
+
+
+def _cohort(dataset, year, term, level):
+    """(summary by grade step, school × step heatmap) for the cohorts arriving in one year/term."""
+    cohorts = cohort_view(dataset)
+    grid = cohort_grid(cohorts, year, term, level, dataset.school_order)
+    return summarize_cohorts(cohorts, year, term, level), cohort_heatmap(grid, year, term)
+
+
+BUILDERS = {
+    "enrolment": _enrolment,
+    "attendance": _attendance,
+    "level_charts": _level_charts,
+    "trends": _trends,
+    "trend_line": _trend_line,
+    "history": _history,
+    "school": _school,
+    "analytics": attendance_analytics,
+    "alerts": attendance_alerts,
+    "projection": project_next_term,
+    "cohorts": cohort_progression,
+    "cohort": _cohort,
+}
+
+
+# ---- Cache ----
+class ViewCache:
+    """LRU of built views keyed by (data version, view, filters).
+
+    Concurrent requests for a view that is still being built wait for the
+    first build instead of repeating it, so the warmer and an early visitor
+    never do the same work twice.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.building = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, dataset, view, *args):
+        key = (dataset.version, view) + args
+        # The warmer yields to visitors once before it builds, claiming nothing while it waits
+        may_build = threading.current_thread() is not _warmer
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return self.entries[key]
+                pending = self.building.get(key)
+                if pending is None and may_build:
+                    pending = self.building[key] = threading.Event()
+                    self.misses += 1
+                    break
+            if pending is None:
+                wait_for_idle()
+                may_build = True
+                continue
+            pending.wait()
+
+        try:
+            value = BUILDERS[view](dataset, *args)
+            with self.lock:
+                self.entries[key] = value
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.building[key]
+            pending.set()
+        return value
+
+
+VIEWS = ViewCache()
+
+
+def enrolment_view(dataset, year, term, level, grade=None):
+    """(summary, table HTML of the first page, gender chart) for the enrolment section."""
+    return VIEWS.get(dataset, "enrolment", int(year), term, level, grade)
+
+
+def attendance_view(dataset, year, term, week, level):
+    """(summary, table HTML of the first page, rate chart) for the attendance summary."""
+    return VIEWS.get(dataset, "attendance", int(year), term, week, level)
+
+
+def level_charts(dataset, year, term, week, compact=False):
+    return VIEWS.get(dataset, "level_charts", int(year), term, week, compact)
+
+
+def trend_charts(dataset, year, term, weeks, compact=False):
+    return VIEWS.get(dataset, "trends", int(year), term, tuple(weeks), compact)
+
+
+def trend_line_chart(dataset, year, term, level):
+    return VIEWS.get(dataset, "trend_line", int(year), term, level)
+
+
+def history_chart(dataset, level, grain=None):
+    """Long-range trend over every year/term; ``grain`` None picks week or term from the span."""
+    return VIEWS.get(dataset, "history", level, grain)
+
+
+def school_charts(dataset, school):
+    """(enrolment chart, weekly gender rate chart) for one school; None where it has no rows."""
+    return VIEWS.get(dataset, "school", school)
+
+
+def analytics_view(dataset):
+    """(weekly metrics, term metrics) for every school and grade; see ``analytics.py``."""
+    return VIEWS.get(dataset, "analytics")
+
+
+def alerts_view(dataset):
+    """Every flagged attendance drop in the history; see ``analytics.attendance_alerts``."""
+    return VIEWS.get(dataset, "alerts")
+
+
+def projection_view(dataset):
+    """Next-term projection for every school and grade; see ``projections.py``."""
+    return VIEWS.get(dataset, "projection")
+
+
+def cohort_view(dataset):
+    """Every school × grade cohort matched with the next grade a year later; see ``cohorts.py``."""
+    return VIEWS.get(dataset, "cohorts")
+
+
+def cohort_summary(dataset, year, term, level):
+    """(summary by grade step, heatmap) for the cohorts arriving in ``year``/``term``."""
+    return VIEWS.get(dataset, "cohort", int(year), term, level)
+
+
+# ---- Usage ----
+class UsageStats:
+    """Counts of the filter selections people render, per programme, kept on disk across restarts.
+
+    A selection is ``(data path, year, term, week, level)``, so the warmer
+    replays it against the programme it was made on.
+    """
+
+    def __init__(self, path=USAGE_PATH, save_every=30):
+        self.path = Path(path)
+        self.save_every = save_every
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self._saved = time.monotonic()
+        try:
+            for key, count in json.loads(self.path.read_text()):
+                if len(key) == 5:  # counts saved before selections carried their programme are dropped
+                    self.counts[tuple(key)] = count
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def record(self, data_path, year, term, week, level):
+        with self.lock:
+            self.counts[(str(data_path), int(year), term, week, level)] += 1
+            self.dirty = True
+            due = time.monotonic() - self._saved >= self.save_every
+        if due:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            rows = [[list(key), count] for key, count in self.counts.items()]
+            self.dirty = False
+            self._saved = time.monotonic()
+        try:
+            self.path.write_text(json.dumps(rows))
+        except OSError:
+            pass
+
+    def top(self, count):
+        with self.lock:
+            return [key for key, _ in self.counts.most_common(count)]
+
+
+USAGE = UsageStats()
+atexit.register(USAGE.save)
+
+
+# ---- Warm-up ----
+def default_selection(dataset):
+    """The latest year/term/week, as the dashboard offers them first."""
+    options = dataset.options
+    year = options.years[-1]
+    term = options.terms_by_year[year][-1]
+    return year, term, dataset.weeks(year, term)[0]
+
+
+def term_trend_weeks(dataset, year, term):
+    """The trend weeks the dashboard selects by default for a year/term, oldest first."""
+    return tuple(sorted(default_trend_weeks(dataset.weeks(year, term)), key=week_number))
+
+
+def warm(dataset, usage=USAGE, top=10):
+    """Build ``dataset``'s default views, then the ``top`` most used selections; returns the number of views built.
+
+    Selections on programmes whose data is not loaded in this process are skipped.
+    """
+    before = VIEWS.misses
+    year, term, week = default_selection(dataset)
+
+    enrolment_view(dataset, year, term, ALL_LEVELS)
+    projection_view(dataset)
+    cohort_view(dataset)
+    attendance_view(dataset, year, term, week, ALL_LEVELS)
+    level_charts(dataset, year, term, week)
+    trend_charts(dataset, year, term, term_trend_weeks(dataset, year, term))
+    trend_line_chart(dataset, year, term, ALL_LEVELS)
+    # Re-run the batch anomaly detector as soon as new data lands
+    alerts_view(dataset)
+
+    for data_path, year, term, week, level in usage.top(top):
+        # Only programmes a visitor has loaded: reading a cold one here would be a cache miss and could
+        # evict the dataset visitors are using to make room for one nobody has open
+        if str(Path(data_path)) not in DATASETS:
+            continue
+        # Each selection on its own programme's data; one that no longer fits is skipped, not the pass
+        try:
+            selected = load_dataset(data_path)
+            if week not in selected.weeks(year, term):
+                continue  # a selection from an older version of the data
+            enrolment_view(selected, year, term, level)
+            attendance_view(selected, year, term, week, level)
+            level_charts(selected, year, term, week)
+            trend_charts(selected, year, term, term_trend_weeks(selected, year, term))
+            trend_line_chart(selected, year, term, level)
+        except (OSError, ValueError, KeyError, IndexError):
+            continue  # programme removed or unreadable, or a level its data does not have
+    return VIEWS.misses - before
+
+
+# ---- Script Runs ----
+# Start time of each script run in progress, by token, and when the last one finished
+_runs = {}
+_last_run_finished = 0.0
+_runs_changed = threading.Condition()
+# A build cannot be interrupted, so the warmer also leaves this long after a run for the next click
+QUIET_S = 2.0
+# A run not finished after this long raised or was stopped early; stop waiting for it
+STALE_RUN_S = 30
+
+
+def run_started():
+    """Mark a script run as in progress; returns the token to pass to ``run_finished``."""
+    token = object()
+    with _runs_changed:
+        _runs[token] = time.monotonic()
+    return token
+
+
+def run_finished(token):
+    global _last_run_finished
+    with _runs_changed:
+        _runs.pop(token, None)
+        _last_run_finished = time.monotonic()
+        _runs_changed.notify_all()
+
+
+def wait_for_idle(quiet=QUIET_S):
+    """Block until no script run is in progress and none has finished in the last ``quiet`` seconds."""
+    with _runs_changed:
+        while True:
+            now = time.monotonic()
+            for token in [token for token, started in _runs.items() if now - started > STALE_RUN_S]:
+                del _runs[token]
+            if not _runs and now - _last_run_finished >= quiet:
+                return
+            _runs_changed.wait(quiet if _runs else quiet - (now - _last_run_finished))
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmer(data_path=DATA_PATH, interval=60, top=10):
+    """Start the warm-up thread once per process; it re-warms when the workbook changes."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is not None:
+            return _warmer
+
+        def run():
+            while True:
+                # Views already cached for the current version cost a lookup, so each
+                # pass only builds what a data refresh or new popular selections need
+                try:
+                    wait_for_idle()
+                    warm(load_dataset(data_path), top=top)
+                except (OSError, ValueError, KeyError, IndexError):
+                    pass  # missing or half-written workbook; try again next round
+                time.sleep(interval)
+
+        _warmer = threading.Thread(target=run, name="fca-view-warmer", daemon=True)
+        _warmer.start()
+        return _warmer
@@ -0,0 +1,608 @@
+"""Plotly figures and HTML tables for the dashboard views.
+
+Used by attendance_2.py and by build_static_site.py, so the live dashboard and
+the offline snapshots render the same charts.
+
+Plotly is imported inside the chart functions rather than here. Streamlit
+itself already imports plotly.graph_objects, so that costs nothing extra;
+what this defers is plotly.express, the heavy part, which nothing on the
+dashboard's first paint (title, instructions, sidebar filters) needs.
+"""
+import json
+from functools import lru_cache
+
+import pandas as pd
+
+# Compact charts label bars client-side from y instead of shipping a text array
+RATE_TEXTTEMPLATE = "%{y:.0f}%"
+
+# ---- Tables ----
+TABLE_CSS = """
+<style>
+.{cls} {{
+    border-collapse: collapse;
+    width: 100%;
+    font-family: 'Segoe UI', sans-serif;
+    font-size: 15px;
+    margin-top: 1rem;
+    margin-bottom: 1rem;
+    table-layout: auto;
+}}
+
+.{cls} th {{
+    background-color: #004c6d;
+    color: white;
+    font-weight: bold;
+    padding: 10px;
+    text-align: center;
+    border: 1px solid #ddd;
+}}
+
+.{cls} td {{
+    padding: 10px;
+    border: 1px solid #ddd;
+    vertical-align: middle;
+    font-weight: 500;
+}}
+
+.{cls} td:first-child {{
+    text-align: left;
+    width: 35%;
+}}
+
+.{cls} td:nth-child(n+2) {{
+    text-align: right;
+}}
+
+.{cls} tr:nth-child(even):not(:last-child) {{
+    background-color: #f9f9f9;
+}}
+
+.{cls} tr:hover:not(:last-child) {{
+    background-color: #e8f4fa;
+}}
+
+.{cls} tr:last-child {{
+    background-color: #e0f7e9;
+    font-weight: bold;
+    border-top: 2px solid #006c4e;
+}}
+</style>
+"""
+
+ATTENDANCE_TABLE_COLS = ["School_Name", "Boys_Attendance", "Girls_Attendance", "Total_Attendance",
+                         "Total_Enrolment", "Attendance Rate (%)"]
+# Schools per page of a summary table; longer tables are paged so the HTML sent stays this size
+TABLE_PAGE_ROWS = 25
+
+
+@lru_cache(maxsize=None)
+def table_css(*classes):
+    """One ``<style>`` block for the summary tables ``classes``, with the pinned TOTAL row styling."""
+    rules = "".join(TABLE_CSS.format(cls=cls).strip()[len("<style>"):-len("</style>")] for cls in classes)
+    # Sent on every rerun, so without the indentation
+    return f"<style>{' '.join(rules.split())}</style>"
+
+
+def table_page(summary, sort_col=None, descending=False, page=0, page_size=TABLE_PAGE_ROWS):
+    """(One page of ``summary`` with its TOTAL row pinned last, number of pages).
+
+    Rows are sorted on the numeric column ``sort_col`` (blank rates last)
+    before slicing; ``None`` keeps the display order. Only the page's rows are
+    ever formatted, so a table's HTML is the same size however many schools it has.
+    """
+    is_total = (summary["School_Name"] == "TOTAL").to_numpy()
+    rows, total = summary[~is_total], summary[is_total]
+    if sort_col is not None:
+        rows = rows.sort_values(sort_col, ascending=not descending, na_position="last", kind="stable")
+    pages = max(1, -(-len(rows) // page_size))
+    page = min(max(page, 0), pages - 1)
+    return pd.concat([rows.iloc[page * page_size:(page + 1) * page_size], total], ignore_index=True), pages
+
+
+def enrolment_table_html(enrol_summary):
+    """Enrolment summary (see ``summarize_enrolment``) as a styled HTML table."""
+    # Format numbers with commas for display
+    formatted_df = enrol_summary.copy()
+    for col in ["Boys", "Girls", "Total"]:
+        formatted_df[col] = formatted_df[col].apply(lambda x: f"{int(x):,}")
+
+    return formatted_df[["School_Name", "Boys", "Girls", "Total"]].to_html(
+        index=False,
+        classes="enrolment-table",
+        escape=False,
+        border=0
+    )
+
+
+def attendance_table_html(attendance_summary):
+    """Attendance summary (see ``summarize_attendance``) as a styled HTML table."""
+    formatted_df = attendance_summary.copy()
+    for col in ATTENDANCE_TABLE_COLS[1:-1]:
+        formatted_df[col] = formatted_df[col].apply(lambda x: f"{int(x):,}")
+    formatted_df["Attendance Rate (%)"] = (
+        formatted_df["Attendance Rate (%)"]
+        .fillna(0)
+        .round(0)
+        .astype(int)
+        .astype(str) + "%")
+
+    return formatted_df[ATTENDANCE_TABLE_COLS].to_html(index=False, classes="attendance-table", escape=False, border=0)
+
+
+# ---- Enrolment Charts ----
+def enrolment_gender_chart(enrol_summary):
+    """Grouped Boys/Girls enrolment bars per school."""
+    import plotly.express as px
+    multi_school_df = enrol_summary[enrol_summary["School_Name"] != "TOTAL"]
+
+    gender_bar_df = pd.melt(
+        multi_school_df,
+        id_vars="School_Name",
+        value_vars=["Boys", "Girls"],
+        var_name="Gender",
+        value_name="Count"
+    )
+
+    # Create an enhanced grouped bar chart
+    fig_multi = px.bar(
+        gender_bar_df,
+        x="School_Name",
+        y="Count",
+        color="Gender",
+        barmode="group",
+        text="Count",
+        title="👨‍👩‍👧‍👦 Enrolment by Gender per School",
+        color_discrete_map={"Boys": "#1f77b4", "Girls": "#e377c2"},  # custom colors
+    )
+
+    # Improve layout and readability
+    fig_multi.update_layout(
+        yaxis_title="Enrolled Learners",
+        xaxis_title="School",
+        title_font_size=20,
+        height=600,
+        bargap=0.2,
+        bargroupgap=0.1,
+        xaxis_tickangle=-30,
+        legend=dict(
+            title="Gender",
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=12)
+        ),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+
+    # Refine trace styling
+    fig_multi.update_traces(
+        texttemplate="%{text:,}",
+        textposition="outside",
+        width=0.3
+    )
+    return fig_multi
+
+
+# ---- Attendance Charts ----
+def attendance_rate_chart(attendance_summary):
+    """Single-colour attendance rate bar per school, TOTAL row excluded."""
+    import plotly.express as px
+    attendance_summary_plot = attendance_summary[attendance_summary["School_Name"] != "TOTAL"]
+    rates = attendance_summary_plot["Attendance Rate (%)"].fillna(0).round(0)
+
+    fig = px.bar(
+        attendance_summary_plot.assign(**{"Attendance Rate (%)": rates}),
+        x="School_Name",
+        y="Attendance Rate (%)",
+        text=rates.astype(int).astype(str) + "%",
+        title="📊 Attendance Rate per School",
+        height=600,
+        width=1800,  # ✅ Manually increase width
+        color_discrete_sequence=["#1f77b4"]  # ✅ Single color to avoid splitting bars
+    )
+
+    fig.update_traces(
+        textposition='outside',
+        marker_line_width=1,
+        marker_line_color='black'
+    )
+
+    fig.update_layout(
+        xaxis_title="School",
+        yaxis_title="Attendance Rate (%)",
+        xaxis_tickangle=45,
+        bargap=0.02,  # ✅ Small gap = thicker bars
+        showlegend=False,
+        margin=dict(l=40, r=40, t=60, b=150),
+        xaxis=dict(categoryorder="total descending")  # ✅ Sorts for clarity
+    )
+    return fig
+
+
+def level_rate_chart(df_level, level, compact=False):
+    """Attendance rate per grade and school for one level (see ``level_frame``).
+
+    ``compact`` draws one trace on a (school, grade) category axis instead of
+    one per grade, each with its own copy of the school names, hover template
+    and styling; bars are coloured by grade, rates rounded to one decimal and
+    labelled in the browser.
+    """
+    import plotly.express as px
+    if compact:
+        import plotly.graph_objects as go
+        colors = px.colors.qualitative.Plotly
+        grades = dict.fromkeys(df_level["Grade_Level"])
+        grade_colors = {grade: colors[i % len(colors)] for i, grade in enumerate(grades)}
+        fig1 = go.Figure(go.Bar(
+            x=[df_level["School_Name"].tolist(), df_level["Grade_Level"].tolist()],
+            y=df_level["Attendance Rate (%)"].round(1).tolist(),
+            marker_color=df_level["Grade_Level"].map(grade_colors).tolist(),
+            customdata=df_level[["Total_Enrolment", "Total_Attendance"]].to_numpy(),
+            hovertemplate="%{x}<br>Attendance Rate (%)=%{y}<br>Total_Enrolment=%{customdata[0]}"
+                          "<br>Total_Attendance=%{customdata[1]}<extra></extra>",
+            texttemplate=RATE_TEXTTEMPLATE,
+        ))
+        fig1.update_layout(
+            title=f"Attendance Rate per Grade and School — {level}",
+            xaxis_title="School / Grade Level",
+            yaxis_title="Attendance Rate (%)",
+            xaxis_tickangle=-45,
+            height=500,
+        )
+        return fig1
+
+    fig1 = px.bar(
+        df_level,
+        x="School_Name",
+        y="Attendance Rate (%)",
+        color="Grade_Level",
+        barmode="group",
+        text="Rate_Label",
+        title=f"Attendance Rate per Grade and School — {level}",
+        hover_data=["Education_Level", "Grade_Level", "Total_Enrolment", "Total_Attendance"]
+    )
+    fig1.update_layout(xaxis_tickangle=-45, height=500)
+    return fig1
+
+
+def level_gender_chart(combined, level, compact=False):
+    """Boys/Girls/Average attendance rate per school for one level (see ``gender_rates``)."""
+    import plotly.express as px
+    fig2 = px.bar(
+        combined.assign(Rate=combined["Rate"].round(1)) if compact else combined,
+        x="School_Name",
+        y="Rate",
+        color="Gender",
+        text=None if compact else "Label",
+        barmode="group",
+        title=f"Attendance Rate by Gender — {level}",
+        hover_data=["Attendance", "Enrolment"]
+    )
+    if compact:
+        fig2.update_traces(texttemplate=RATE_TEXTTEMPLATE)
+    fig2.update_layout(xaxis_tickangle=-45, height=500)
+    return fig2
+
+
+# ---- Trend Charts ----
+@lru_cache(maxsize=32)
+def _subplot_grid(n_plots, n_cols):
+    """JSON layout of ``make_subplots`` for ``n_plots`` titled subplots sharing y axes, ``n_cols`` wide.
+
+    make_subplots validates its axes one update at a time, which costs more
+    than the traces of a 200-school chart; the grid only depends on its size,
+    so it is built once per size and each chart fills in its own titles.
+    """
+    from plotly.subplots import make_subplots
+    fig = make_subplots(
+        rows=-(-n_plots // n_cols),  # Ceiling division
+        cols=n_cols,
+        subplot_titles=[str(i) for i in range(n_plots)],
+        shared_yaxes=True,
+        shared_xaxes=False,
+    )
+    return json.dumps(fig.layout.to_plotly_json())
+
+
+def trend_chart(trend_df, level, compact=False):
+    """Stacked week-over-week grade rates, one subplot per school (see ``weekly_trends``).
+
+    ``compact`` draws the same stacks on one (school, grade) axis instead; see
+    ``compact_trend_chart``.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    if compact:
+        return compact_trend_chart(trend_df, level)
+
+    # Newest to oldest, so the latest week stacks on top
+    ordered_weeks = list(trend_df["Attendance_Week"].cat.categories)
+
+    # Get unique school facets
+    school_facets = trend_df["School_Name"].unique()
+    n_cols = 2
+
+    # Create subplot layout: the cached grid for this many schools, titled with them
+    layout = json.loads(_subplot_grid(len(school_facets), n_cols))
+    for annotation, school in zip(layout["annotations"], school_facets):
+        annotation["text"] = school
+    fig_trend = go.Figure(layout=layout)
+
+    colors = px.colors.qualitative.Plotly  # Consistent color palette
+
+    # One school × grade by week table of rates and one of labels, instead of a boolean mask per
+    # school × week × grade; grades a week has no rows for show as 0
+    cells = trend_df.set_index(["School_Name", "Grade_Level", "Attendance_Week"])
+    rates = cells["Attendance_Rate"].unstack("Attendance_Week").reindex(columns=ordered_weeks).fillna(0)
+    labels = cells["Label"].unstack("Attendance_Week").reindex(columns=ordered_weeks).fillna("0%")
+
+    # For each school, stacked bars for each grade with each week as a segment, added in one batch;
+    # subplots are numbered row by row, as make_subplots numbers their axes
+    traces = []
+    for idx, school in enumerate(school_facets):
+        axis = "" if idx == 0 else idx + 1
+        school_rates, school_labels = rates.loc[school], labels.loc[school]
+        grades = list(school_rates.index)
+
+        # Newest to oldest, so top=latest
+        for week_index, week in enumerate(ordered_weeks):
+            traces.append(go.Bar(
+                x=grades,
+                y=list(school_rates[week]),
+                name=week,
+                marker_color=colors[week_index % len(colors)],
+                text=list(school_labels[week]),
+                textposition="inside",
+                texttemplate="%{text}",
+                showlegend=(idx == 0),
+                xaxis=f"x{axis}",
+                yaxis=f"y{axis}",
+            ))
+    fig_trend.add_traces(traces)
+
+    fig_trend.update_layout(
+        height=800,
+        barmode="stack",
+        title_text=f"📊 Weekly Attendance Trends per Grade — {level}",
+        legend_title="Attendance Week",
+        yaxis_title="Attendance Rate (%)",
+        xaxis_title="Grade Level"
+    )
+
+    # Reverse legend order so newest week is at the top
+    fig_trend.update_layout(legend_traceorder="reversed")
+    return fig_trend
+
+
+def compact_trend_chart(trend_df, level):
+    """``trend_chart`` with one trace per week instead of one per school × week.
+
+    Schools and grades share a single two-level category axis, so every trace
+    carries the same short x arrays, rates are rounded to one decimal and bar
+    labels are formatted in the browser. The payload grows with the number of
+    bars rather than with the number of subplots.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    ordered_weeks = list(trend_df["Attendance_Week"].cat.categories)
+    # Grades missing for a school in one week stack as 0, as in the subplot version
+    rates = trend_df.pivot_table(
+        index=["School_Name", "Grade_Level"], columns="Attendance_Week",
+        values="Attendance_Rate", fill_value=0, observed=True,
+    ).round(1)
+    x = [rates.index.get_level_values(0).tolist(), rates.index.get_level_values(1).tolist()]
+    colors = px.colors.qualitative.Plotly
+
+    fig_trend = go.Figure()
+    for week_index, week in enumerate(ordered_weeks):
+        if week not in rates.columns:
+            continue
+        fig_trend.add_trace(go.Bar(
+            x=x,
+            y=rates[week].tolist(),
+            name=week,
+            marker_color=colors[week_index % len(colors)],
+            texttemplate=RATE_TEXTTEMPLATE,
+            textposition="inside",
+        ))
+
+    fig_trend.update_layout(
+        height=800,
+        barmode="stack",
+        title_text=f"📊 Weekly Attendance Trends per Grade — {level}",
+        legend_title="Attendance Week",
+        legend_traceorder="reversed",
+        yaxis_title="Attendance Rate (%)",
+        xaxis_title="School / Grade Level",
+        xaxis_tickangle=-45,
+    )
+    return fig_trend
+
+
+def attendance_line_chart(weekly_attendance_df):
+    """Total attendance per week, one line per school (see ``weekly_attendance``)."""
+    import plotly.express as px
+    fig = px.line(
+        weekly_attendance_df,
+        x="Attendance_Week",
+        y="Total_Attendance",
+        color="School_Name",
+        markers=True,
+        labels={"Attendance_Week": "Week", "Total_Attendance": "Attendance"},
+        title="Attendance Trend Over Time"
+    )
+
+    fig.update_layout(
+        xaxis_title="Week",
+        yaxis_title="Total Attendance",
+        plot_bgcolor='white',
+        hovermode='x unified',
+        legend_title_text="School"
+    )
+    return fig
+
+
+def long_range_chart(history, grain, max_ticks=20):
+    """WebGL attendance lines per school over the whole history (see ``attendance_history``).
+
+    ``Scattergl`` draws on the GPU, so hundreds of schools stay responsive.
+    Periods are categories in time order with a thinned set of tick labels.
+    """
+    import plotly.graph_objects as go
+    periods = history[["Position", "Period"]].drop_duplicates().sort_values("Position")["Period"].tolist()
+    # Markers only while there are few enough periods to tell them apart
+    mode = "lines+markers" if len(periods) <= 30 else "lines"
+
+    fig = go.Figure()
+    for school, series in history.groupby("School_Name", sort=False):
+        fig.add_trace(go.Scattergl(
+            x=series["Period"].tolist(),
+            y=series["Total_Attendance"].round(1).tolist(),
+            mode=mode,
+            name=school,
+        ))
+
+    fig.update_layout(
+        title=f"Attendance Trend Over Time — per {grain}",
+        xaxis=dict(title="Term" if grain == "term" else "Week", type="category", categoryorder="array",
+                   categoryarray=periods, tickvals=periods[::max(1, -(-len(periods) // max_ticks))],
+                   tickangle=-45),
+        yaxis_title="Average Weekly Attendance" if grain == "term" else "Total Attendance",
+        plot_bgcolor='white',
+        hovermode="x",
+        legend_title_text="School",
+        height=600,
+    )
+    return fig
+
+
+def rolling_rate_chart(school_weeks, rate_col):
+    """Weekly and rolling attendance rate per grade for one school (see ``analytics.weekly_metrics``)."""
+    import plotly.express as px
+    periods = (
+        school_weeks["Year"].astype(str) + " T" + school_weeks["Term"].astype(str) + " " + school_weeks["Attendance_Week"]
+    )
+    fig = px.line(
+        school_weeks.assign(Period=periods, **{rate_col: school_weeks[rate_col].round(1)}),
+        x="Period",
+        y=rate_col,
+        color="Grade_Level",
+        markers=True,
+        hover_data={"Rate (%)": ":.1f", "Cumulative Term Attendance": ":,.0f"},
+        title=f"{rate_col} by Grade",
+    )
+    fig.update_layout(
+        xaxis_title="Week",
+        yaxis_title="Attendance Rate (%)",
+        xaxis=dict(type="category", tickangle=-45),
+        plot_bgcolor='white',
+        legend_title_text="Grade",
+    )
+    return fig
+
+
+# ---- School Charts ----
+def school_enrolment_chart(terms):
+    """Boys/Girls enrolment per year/term for one school (see ``SchoolPartitions``)."""
+    import plotly.express as px
+    periods = terms["Year"].astype(str) + " T" + terms["Term"].astype(str)
+    gender_bar_df = pd.melt(
+        terms.assign(Period=periods),
+        id_vars="Period",
+        value_vars=["Boys", "Girls"],
+        var_name="Gender",
+        value_name="Count"
+    )
+    fig = px.bar(
+        gender_bar_df,
+        x="Period",
+        y="Count",
+        color="Gender",
+        barmode="group",
+        title="👨‍👩‍👧‍👦 Enrolment by Gender per Term",
+        color_discrete_map={"Boys": "#1f77b4", "Girls": "#e377c2"},
+    )
+    fig.update_layout(
+        xaxis_title="Term",
+        yaxis_title="Enrolled Learners",
+        xaxis=dict(type="category"),
+        plot_bgcolor='white',
+        legend_title_text="Gender",
+    )
+    return fig
+
+
+def school_rate_chart(weeks):
+    """Boys, Girls and overall attendance rate per week for one school, across every term."""
+    import plotly.express as px
+    periods = weeks["Year"].astype(str) + " T" + weeks["Term"].astype(str) + " W" + weeks["Week"].astype(str)
+    rate_df = pd.melt(
+        weeks.assign(Period=periods),
+        id_vars="Period",
+        value_vars=["Boys Rate (%)", "Girls Rate (%)", "Attendance Rate (%)"],
+        var_name="Gender",
+        value_name="Rate (%)"
+    )
+    rate_df["Gender"] = rate_df["Gender"].map({"Boys Rate (%)": "Boys", "Girls Rate (%)": "Girls",
+                                               "Attendance Rate (%)": "Average"})
+    fig = px.line(
+        rate_df.assign(**{"Rate (%)": rate_df["Rate (%)"].round(1)}),
+        x="Period",
+        y="Rate (%)",
+        color="Gender",
+        markers=True,
+        title="📈 Weekly Attendance Rate by Gender",
+        color_discrete_map={"Boys": "#1f77b4", "Girls": "#e377c2", "Average": "#006C4E"},
+    )
+    fig.update_layout(
+        xaxis_title="Week",
+        yaxis_title="Attendance Rate (%)",
+        xaxis=dict(type="category", tickangle=-45),
+        plot_bgcolor='white',
+        hovermode='x unified',
+        legend_title_text="Gender",
+    )
+    return fig
+
+
+# ---- Cohort Charts ----
+def cohort_heatmap(grid, year, term):
+    """Progression rate per school and grade step (see ``cohorts.cohort_grid``); red where cohorts shrink."""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Heatmap(
+        z=grid.round(1).to_numpy(),
+        x=list(grid.columns),
+        y=list(grid.index),
+        colorscale="RdYlGn",
+        zmin=50,
+        zmax=100,
+        texttemplate="%{z:.0f}%",
+        hovertemplate="%{y}<br>%{x}: %{z:.1f}%<extra></extra>",
+        colorbar=dict(title="Rate (%)"),
+    ))
+    fig.update_layout(
+        title=f"🎓 Progression Rate into Term {term}, {year} by School and Grade",
+        xaxis_title="Grade Step",
+        yaxis=dict(title="School", autorange="reversed"),
+        plot_bgcolor='white',
+        height=max(400, 40 * len(grid) + 200),
+    )
+    return fig
+
+
+# ---- Payload ----
+def figure_bytes(fig):
+    """Size of the JSON Streamlit sends to the browser for ``fig``."""
+    import plotly.io as pio
+    return len(pio.to_json(fig, validate=False).encode("utf-8"))
+
+
+def payload_report(charts):
+    """Traces and serialized size per chart, largest first, from ``(name, figure)`` pairs."""
+    rows = [{"Chart": name, "Traces": len(fig.data), "Size (KB)": figure_bytes(fig) / 1024} for name, fig in charts]
+    report = pd.DataFrame(rows, columns=["Chart", "Traces", "Size (KB)"])
+    return report.sort_values("Size (KB)", ascending=False, ignore_index=True)